@@ -1,9 +1,14 @@
 from services.query_engine.semantic_service import SemanticQueryService
 from cli.commands.query import format_results
+from db.session import get_session
 
 def db_find_command(args):
     if not args:
         return "Usage: db.find \"<search text>\""
     text = " ".join(args).strip('"')
-    results = SemanticQueryService.semantic_search_text(text)
+    with get_session() as db:
+        results = SemanticQueryService.semantic_search(db, text)
+        db.commit()  # keeps a new query embedding in embedding_cache
+    if not results:
+        return "No results."
     return format_results(results)
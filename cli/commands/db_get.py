@@ -1,5 +1,7 @@
 from services.entities import EntityService
+from services.fuzzy_match import FuzzyMatchService
 from cli.renderers import render_entity_card
+from db.session import get_session
 
 def db_get_command(args):
     if not args:
@@ -8,9 +10,11 @@ def db_get_command(args):
     entity = EntityService.get_by_canonical_id(canonical_id)
     if not entity:
         # Fuzzy suggestions
-        suggestions = EntityService.suggest_canonical_ids(canonical_id)
+        with get_session() as db:
+            matches = FuzzyMatchService.top_k(db, canonical_id)
         msg = f"Entity '{canonical_id}' not found."
-        if suggestions:
+        if matches:
+            suggestions = [f"{m.canonical_id}  {m.title or ''} ({m.similarity:.2f})" for m in matches]
             msg += "\nDid you mean:\n  " + "\n  ".join(suggestions)
             msg += f"\nTry:\n  query tasks --search \"{canonical_id}\""
         return msg
@@ -1,9 +1,19 @@
-from services.entity_index import EntityIndexService
+from services.query_engine.parser import parse_query_args
+from services.query_engine.service import QueryService
 from cli.commands.query import format_results
+from db.session import get_session
+
+# Only the columns format_results prints; skips search_vector and ORM hydration
+LIST_FIELDS = ["canonical_id", "title", "status", "priority", "tags", "updated_at", "summary"]
 
 def db_list_command(args):
     if not args:
-        return "Usage: db.list <entity_type>"
-    etype = args[0]
-    entities = EntityIndexService.list_by_type(etype)
-    return format_results(entities)
+        return "Usage: db.list <entity_type> [--fields a,b,c] [--limit N]"
+    criteria = parse_query_args(list(args))
+    fields = criteria.fields
+    criteria.fields = fields or LIST_FIELDS
+    if "--limit" not in args:
+        criteria.limit = None  # list the whole type, as before
+    with get_session() as db:
+        entities = QueryService.search(db, criteria)
+    return format_results(entities, fields)
@@ -1,27 +1,122 @@
+import atexit
+from sqlalchemy.exc import SQLAlchemyError
 from services.query_engine.parser import parse_query_args
-from services.query_engine.service import QueryService
+from services.query_engine.service import QueryService, keyset_paged
 from services.query_engine.semantic_service import SemanticQueryService
+from services.query_engine.pagination import encode_cursor, next_cursor
+from services.query_engine.result_cache import result_cache
+from services.query_engine.profiler import QueryProfile
 from db.session import get_session
 
-def format_results(results):
-    lines = []
-    for i, r in enumerate(results, start=1):
-        lines.append(f"[{i}] {r.canonical_id}  {r.title}")
-        if r.status:
-            lines.append(f"    status: {r.status}   priority: {r.priority or 'n/a'}")
-        if r.tags:
-            lines.append(f"    tags: {r.tags}")
-        lines.append(f"    updated: {r.updated_at}")
-        lines.append(f"    summary: {r.summary or ''}\n")
+def format_result(i, r, fields=None):
+    if fields:
+        return f"[{i}] " + "  ".join(f"{f}: {getattr(r, f)}" for f in fields)
+    lines = [f"[{i}] {r.canonical_id}  {r.title}"]
+    if r.status:
+        lines.append(f"    status: {r.status}   priority: {r.priority or 'n/a'}")
+    if r.tags:
+        lines.append(f"    tags: {r.tags}")
+    if getattr(r, "snippet", None):
+        lines.append(f"    match: {r.snippet}   rank: {r.rank:.3f}")
+    lines.append(f"    updated: {r.updated_at}")
+    lines.append(f"    summary: {r.summary or ''}\n")
     return "\n".join(lines)
 
+def format_results(results, fields=None):
+    return "\n".join(format_result(i, r, fields) for i, r in enumerate(results, start=1))
+
+def format_facets(facets):
+    lines = [f"=== Facets ({facets['total']} matching) ==="]
+    for facet, counts in facets.items():
+        if facet == "total":
+            continue
+        lines.append(f"{facet}:")
+        for value, n in counts:
+            lines.append(f"    {value if value is not None else '(none)'}: {n}")
+    return "\n".join(lines)
+
+def stream_results(db, criteria):
+    """
+    Print rows as they arrive from the server-side cursor; returns a footer.
+    """
+    count = 0
+    last = None
+    for count, r in enumerate(QueryService.stream(db, criteria), start=1):
+        print(format_result(count, r, criteria.fields), flush=True)
+        last = r
+    if not count:
+        return "No results."
+    footer = f"-- {count} rows streamed"
+    # a (updated_at, id) cursor is only meaningful for keyset order, not rank
+    if keyset_paged(criteria) and criteria.limit is not None and count >= criteria.limit:
+        footer += f"\nnext: --cursor {encode_cursor(last.updated_at, last.id)}"
+    return footer
+
+def flush_telemetry(force: bool = False):
+    """
+    Write result cache telemetry at most once a minute, and whatever is left
+    at exit. Its own session: the commit would expire the query's rows.
+    """
+    if not result_cache.telemetry_due(0.0 if force else 60.0):
+        return
+    with get_session() as db:
+        result_cache.flush_telemetry(db, force=force)
+
+@atexit.register
+def _flush_telemetry_at_exit():
+    # best effort: a database that has gone away must not fail the exit
+    try:
+        flush_telemetry(force=True)
+    except SQLAlchemyError:
+        pass
+
+def explain_command(args: list[str]):
+    """
+    Run the query with per-stage timings, then EXPLAIN (ANALYZE, BUFFERS)
+    every statement it issued. Caches are bypassed so timings are real.
+    """
+    profile = QueryProfile()
+    with profile.stage("parse"):
+        criteria = parse_query_args(args)
+    with get_session() as db:
+        if criteria.count:
+            QueryService.count(db, criteria, profile=profile)
+        elif criteria.facets:
+            facets = QueryService.facets(db, criteria, profile=profile)
+            with profile.stage("format"):
+                format_facets(facets)
+        else:
+            if criteria.semantic_text:
+                results = SemanticQueryService.hybrid_search(db, criteria, profile=profile)
+            else:
+                results = QueryService.search(db, criteria, profile=profile)
+            with profile.stage("format"):
+                format_results(results, criteria.fields)
+        profile.explain(db)
+    return profile.render()
+
 def query_command(args: list[str]):
+    if "--explain" in args:
+        return explain_command(args)
     criteria = parse_query_args(args)
     with get_session() as db:
-        if getattr(criteria, "semantic_text", None):
-            results = SemanticQueryService.hybrid_search(db, criteria)
+        if criteria.count:
+            n = QueryService.count(db, criteria, estimate=criteria.estimate)
+            output = f"{n} matching" + (" (estimate allowed)" if criteria.estimate else "")
+        elif criteria.facets:
+            output = format_facets(QueryService.facets(db, criteria))
+        elif criteria.stream and not getattr(criteria, "semantic_text", None):
+            return stream_results(db, criteria)
         else:
-            results = QueryService.search(db, criteria)
-    if not results:
-        return "No results."
-    return format_results(results)
+            if getattr(criteria, "semantic_text", None):
+                results = SemanticQueryService.hybrid_search(db, criteria)
+                db.commit()  # keeps a new query embedding in embedding_cache
+            else:
+                results = QueryService.search(db, criteria)
+            output = format_results(results, criteria.fields) if results else "No results."
+            if results and not criteria.semantic_text and keyset_paged(criteria):
+                cursor = next_cursor(results, criteria.limit)
+                if cursor:
+                    output += f"\nnext: --cursor {cursor}"
+    flush_telemetry()
+    return output
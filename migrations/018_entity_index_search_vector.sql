@@ -0,0 +1,26 @@
+-- Migration for weighted entity_index.search_vector maintained on write
+-- Weights: title (A), summary (B), tags (C). A trigger is used rather than a
+-- generated column because array_to_string is not IMMUTABLE.
+CREATE OR REPLACE FUNCTION entity_index_search_vector(title TEXT, summary TEXT, tags TEXT[])
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(summary, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(array_to_string(tags, ' '), '')), 'C');
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION entity_index_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := entity_index_search_vector(NEW.title, NEW.summary, NEW.tags);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_entity_index_search_vector ON entity_index;
+CREATE TRIGGER trg_entity_index_search_vector
+    BEFORE INSERT OR UPDATE OF title, summary, tags ON entity_index
+    FOR EACH ROW EXECUTE FUNCTION entity_index_search_vector_trigger();
+
+-- Backfill rows indexed before the trigger existed
+UPDATE entity_index
+   SET search_vector = entity_index_search_vector(title, summary, tags)
+ WHERE search_vector IS NULL;
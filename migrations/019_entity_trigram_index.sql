@@ -0,0 +1,7 @@
+-- Migration for trigram fuzzy lookup on entity titles and canonical IDs
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_entity_title_trgm
+    ON entity USING GIN (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_entity_canonical_id_trgm
+    ON entity USING GIN (canonical_id gin_trgm_ops);
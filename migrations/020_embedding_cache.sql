@@ -0,0 +1,14 @@
+-- Migration for content-addressed embedding cache
+-- Embeddings are keyed by (model, sha256 of the embedded text) so identical
+-- input is never sent to the embeddings API twice.
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model         TEXT NOT NULL,
+    content_hash  TEXT NOT NULL,
+    embedding     vector NOT NULL,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (model, content_hash)
+);
+
+-- Lets update_embedding_for_entity skip entities whose text is unchanged
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS model TEXT;
@@ -0,0 +1,35 @@
+-- Migration for per-row embedding model and dimensions
+-- entity_embedding held one vector(1536) per entity with no record of which
+-- model produced it. Each row now names its model and size, and an entity
+-- may hold one vector per (model, dimensions) so spaces can coexist while
+-- re-embedding.
+
+DROP INDEX IF EXISTS idx_entity_embedding_vector;
+
+ALTER TABLE entity_embedding ALTER COLUMN embedding TYPE vector;
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS model TEXT;
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS dimensions INT;
+
+-- Rows written before the model was recorded came from the Notion sync,
+-- which embeds with text-embedding-3-small
+UPDATE entity_embedding SET model = 'text-embedding-3-small' WHERE model IS NULL;
+UPDATE entity_embedding SET dimensions = vector_dims(embedding) WHERE dimensions IS NULL;
+
+ALTER TABLE entity_embedding ALTER COLUMN model SET NOT NULL;
+ALTER TABLE entity_embedding ALTER COLUMN dimensions SET NOT NULL;
+ALTER TABLE entity_embedding DROP CONSTRAINT IF EXISTS entity_embedding_dimensions_check;
+ALTER TABLE entity_embedding
+    ADD CONSTRAINT entity_embedding_dimensions_check CHECK (vector_dims(embedding) = dimensions);
+
+ALTER TABLE entity_embedding DROP CONSTRAINT IF EXISTS entity_embedding_entity_id_key;
+ALTER TABLE entity_embedding DROP CONSTRAINT IF EXISTS entity_embedding_entity_space_key;
+ALTER TABLE entity_embedding
+    ADD CONSTRAINT entity_embedding_entity_space_key UNIQUE (entity_id, model, dimensions);
+CREATE INDEX IF NOT EXISTS idx_entity_embedding_space ON entity_embedding (model, dimensions);
+
+-- ANN indexes need a fixed size, so there is one partial expression index
+-- per (model, dimensions); queries cast to the same vector(n) to use it
+CREATE INDEX IF NOT EXISTS idx_entity_embedding_text_embedding_3_small_1536
+    ON entity_embedding USING ivfflat ((embedding::vector(1536)) vector_cosine_ops)
+    WITH (lists = 100)
+    WHERE model = 'text-embedding-3-small' AND dimensions = 1536;
@@ -0,0 +1,12 @@
+-- Migration for the incremental re-embedding worker
+-- One resumable position per vector space ("model@dimensions") in the
+-- worker's (entity.updated_at, entity.id) walk over stale entities.
+CREATE TABLE IF NOT EXISTS embedding_worker_checkpoint (
+    space            TEXT PRIMARY KEY,
+    last_updated_at  TIMESTAMPTZ,
+    last_entity_id   UUID,
+    updated_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Keyset order for the staleness scan
+CREATE INDEX IF NOT EXISTS idx_entity_updated_at_id ON entity (updated_at, id);
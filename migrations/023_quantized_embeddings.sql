@@ -0,0 +1,22 @@
+-- Migration for quantized copies of entity_embedding vectors
+-- embedding_half (halfvec, 2 bytes/dim) and embedding_bits (binary
+-- quantized, 1 bit/dim) back the candidate search; the full-precision
+-- embedding is only read to re-rank the candidates. A trigger keeps both
+-- in step with embedding on write. Existing rows are filled by
+-- scripts/backfill_quantized_embeddings.py in batches rather than here, so
+-- the migration does not rewrite the table in one transaction.
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS embedding_half halfvec;
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS embedding_bits bit varying;
+
+CREATE OR REPLACE FUNCTION entity_embedding_quantize_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.embedding_half := NEW.embedding::halfvec;
+    NEW.embedding_bits := binary_quantize(NEW.embedding);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_entity_embedding_quantize ON entity_embedding;
+CREATE TRIGGER trg_entity_embedding_quantize
+    BEFORE INSERT OR UPDATE OF embedding ON entity_embedding
+    FOR EACH ROW EXECUTE FUNCTION entity_embedding_quantize_trigger();
@@ -0,0 +1,10 @@
+-- Migration for resumable bulk entity_index rebuilds
+-- One row per rebuild run (a full rebuild, or one id-range partition of a
+-- parallel one): the last entity id written, updated in the same
+-- transaction as each committed chunk. Removed when the run completes.
+CREATE TABLE IF NOT EXISTS index_rebuild_checkpoint (
+    name            TEXT PRIMARY KEY,
+    last_entity_id  UUID NOT NULL,
+    rows_done       BIGINT NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,61 @@
+-- Migration for change-log driven entity_index maintenance
+-- Every insert, update and delete on entity appends the entity id to
+-- entity_change (statement-level triggers with transition tables, so a
+-- bulk sync costs one INSERT ... SELECT per statement). The incremental
+-- indexer (services/indexing.py IncrementalIndexer) deletes claimed rows in
+-- the same transaction that refreshes entity_index, so a change is
+-- consumed exactly when its index update commits.
+CREATE TABLE IF NOT EXISTS entity_change (
+    id          BIGSERIAL PRIMARY KEY,
+    entity_id   UUID NOT NULL,
+    op          CHAR(1) NOT NULL,           -- I, U, D
+    changed_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION entity_change_log_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO entity_change (entity_id, op) SELECT id, 'I' FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO entity_change (entity_id, op) SELECT id, 'D' FROM old_rows;
+    ELSE
+        -- no-op updates (same values rewritten by a sync) are not changes
+        INSERT INTO entity_change (entity_id, op)
+        SELECT n.id, 'U' FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE (n.*) IS DISTINCT FROM (o.*);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS trg_entity_change_insert ON entity;
+CREATE TRIGGER trg_entity_change_insert
+    AFTER INSERT ON entity REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION entity_change_log_trigger();
+DROP TRIGGER IF EXISTS trg_entity_change_update ON entity;
+CREATE TRIGGER trg_entity_change_update
+    AFTER UPDATE ON entity REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION entity_change_log_trigger();
+DROP TRIGGER IF EXISTS trg_entity_change_delete ON entity;
+CREATE TRIGGER trg_entity_change_delete
+    AFTER DELETE ON entity REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION entity_change_log_trigger();
+
+-- Embeddings of changed entities are flagged for the re-embedding worker;
+-- any write of a new vector (or a touch of updated_at for unchanged text)
+-- clears the flag.
+ALTER TABLE entity_embedding ADD COLUMN IF NOT EXISTS stale BOOLEAN NOT NULL DEFAULT false;
+CREATE INDEX IF NOT EXISTS idx_entity_embedding_stale ON entity_embedding (entity_id) WHERE stale;
+
+CREATE OR REPLACE FUNCTION entity_embedding_fresh_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.stale := false;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_entity_embedding_fresh ON entity_embedding;
+CREATE TRIGGER trg_entity_embedding_fresh
+    BEFORE UPDATE OF embedding, updated_at ON entity_embedding
+    FOR EACH ROW EXECUTE FUNCTION entity_embedding_fresh_trigger();
@@ -0,0 +1,7 @@
+-- Migration for expiring query-text entries in embedding_cache
+-- Vectors for ad-hoc query text are kept for a while (expires_at), not
+-- forever; entity text keeps NULL and never expires. Expired rows are
+-- ignored by lookups and deleted by the embedding worker.
+ALTER TABLE embedding_cache ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_expires_at
+    ON embedding_cache (expires_at) WHERE expires_at IS NOT NULL;
@@ -20,4 +20,4 @@ class Entity(Base):
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
 
     index = relationship('EntityIndex', uselist=False, back_populates='entity')
-    embedding = relationship('EntityEmbedding', uselist=False, back_populates='entity')
+    embeddings = relationship('EntityEmbedding', back_populates='entity')
@@ -1,27 +1,62 @@
-from sqlalchemy import Column, TIMESTAMP, ForeignKey, func
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Text, Integer, Boolean, TIMESTAMP, ForeignKey, UniqueConstraint, func, false
+from sqlalchemy.dialects.postgresql import UUID, BIT
+from sqlalchemy.orm import relationship, deferred
 from .base import Base
-from sqlalchemy.types import TypeDecorator
-import numpy as np
+from sqlalchemy.types import UserDefinedType
+import json
 
-class Vector(TypeDecorator):
-    impl = Base.metadata.bind.dialect.type_descriptor('vector(1536)')
+class Vector(UserDefinedType):
+    """
+    pgvector column. Values travel in pgvector's text form ('[1,2,3]'), which
+    needs no driver-side adapter.
+    """
     cache_ok = True
-    def process_bind_param(self, value, dialect):
-        if isinstance(value, list):
-            return np.array(value, dtype=np.float32)
-        return value
-    def process_result_value(self, value, dialect):
-        return list(value) if value is not None else None
+
+    def __init__(self, dim=None):
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        return f"vector({self.dim})" if self.dim else "vector"
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None:
+                return None
+            return "[" + ",".join(str(float(x)) for x in value) + "]"
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None or isinstance(value, list):
+                return value
+            return json.loads(value) if isinstance(value, str) else list(value)
+        return process
+
+class HalfVector(Vector):
+    """
+    pgvector halfvec: 2-byte floats, same text form as vector.
+    """
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return f"halfvec({self.dim})" if self.dim else "halfvec"
 
 class EntityEmbedding(Base):
     __tablename__ = 'entity_embedding'
+    __table_args__ = (UniqueConstraint('entity_id', 'model', 'dimensions'),)
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=func.gen_random_uuid())
-    entity_id = Column(UUID(as_uuid=True), ForeignKey('entity.id', ondelete='CASCADE'), nullable=False, unique=True)
-    embedding = Column(Vector)
+    entity_id = Column(UUID(as_uuid=True), ForeignKey('entity.id', ondelete='CASCADE'), nullable=False)
+    embedding = Column(Vector())
+    model = Column(Text, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    # quantized copies maintained by trigger (migration 023); search-only
+    embedding_half = deferred(Column(HalfVector()))
+    embedding_bits = deferred(Column(BIT(varying=True)))
+    content_hash = Column(Text)
+    # set when the entity changes (migration 025), cleared on re-embed
+    stale = Column(Boolean, nullable=False, server_default=false())
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
-    entity = relationship('Entity', back_populates='embedding')
+    entity = relationship('Entity', back_populates='embeddings')
 
 # Add to Entity model:
-# embedding = relationship('EntityEmbedding', uselist=False, back_populates='entity')
+# embeddings = relationship('EntityEmbedding', back_populates='entity')
@@ -0,0 +1,89 @@
+import os, sys, argparse, time
+from sqlalchemy import text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import engine, get_session
+from services.query_engine.ann_index import index_name
+
+# Fill embedding_half / embedding_bits (migration 023) for rows written
+# before the quantize trigger existed, one committed batch at a time, then
+# build the per-space hnsw indexes the quantized candidate search uses.
+# Safe to re-run: filled rows are skipped and indexes are IF NOT EXISTS.
+
+BACKFILL_BATCH = text("""
+UPDATE entity_embedding
+SET embedding_half = embedding::halfvec,
+    embedding_bits = binary_quantize(embedding)
+WHERE id IN (
+    SELECT id FROM entity_embedding
+    WHERE embedding IS NOT NULL AND (embedding_half IS NULL OR embedding_bits IS NULL)
+    LIMIT :batch
+    FOR UPDATE SKIP LOCKED
+)
+""")
+
+REMAINING = text("""
+SELECT count(*) FROM entity_embedding
+WHERE embedding IS NOT NULL AND (embedding_half IS NULL OR embedding_bits IS NULL)
+""")
+
+SPACES = text("SELECT model, dimensions, count(*) FROM entity_embedding GROUP BY model, dimensions ORDER BY 3 DESC")
+
+# cast to a fixed size like the query side does (see compact_distance)
+INDEXES = {
+    "half": "((embedding_half::halfvec({dims})) halfvec_cosine_ops)",
+    "bits": "((embedding_bits::bit({dims})) bit_hamming_ops)",
+}
+
+def backfill(batch: int):
+    with get_session() as db:
+        remaining = db.execute(REMAINING).scalar()
+        print(f"{remaining} rows to quantize")
+        done = 0
+        started = time.perf_counter()
+        while True:
+            n = db.execute(BACKFILL_BATCH, {"batch": batch}).rowcount
+            db.commit()
+            if not n:
+                break
+            done += n
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            print(f"  {done}/{remaining} ({rate:.0f} rows/s)", flush=True)
+
+def create_indexes(kinds, m: int, ef_construction: int):
+    with get_session() as db:
+        spaces = db.execute(SPACES).all()
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for model, dims, rows in spaces:
+            for kind in kinds:
+                name = index_name(model, dims, kind)
+                print(f"{name}: {rows} rows ...", flush=True)
+                started = time.perf_counter()
+                # model is a value from our own table, but still goes in quoted
+                conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON entity_embedding "
+                    f"USING hnsw {INDEXES[kind].format(dims=int(dims))} "
+                    f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)}) "
+                    f"WHERE model = '{model.replace(chr(39), chr(39) * 2)}' AND dimensions = {int(dims)}"
+                ))
+                print(f"  built in {time.perf_counter() - started:.1f}s")
+
+def main():
+    ap = argparse.ArgumentParser(description="Backfill quantized embedding copies and their hnsw indexes")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--index", choices=["half", "bits", "both", "none"], default="both",
+                    help="which hnsw indexes to build after the backfill")
+    ap.add_argument("--m", type=int, default=16)
+    ap.add_argument("--ef-construction", type=int, default=64)
+    args = ap.parse_args()
+
+    backfill(args.batch_size)
+    if args.index != "none":
+        kinds = ["half", "bits"] if args.index == "both" else [args.index]
+        create_indexes(kinds, args.m, args.ef_construction)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os, sys, argparse, statistics, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.query_engine.embedding_models import MODELS, truncate
+
+# Recall@k and latency of exact top-k when vectors are truncated to fewer
+# (Matryoshka) dimensions, against the full-size vectors as ground truth.
+#   --source db         stored vectors of --model from entity_embedding (DATABASE_URL);
+#                       held-out rows act as queries
+#   --source synthetic  random vectors whose variance decays with the
+#                       dimension index, the way Matryoshka-trained models
+#                       front-load information
+# --pgvector also times a pgvector scan per size in a temp table.
+
+def load_db(args):
+    from sqlalchemy import create_engine, text
+    native = MODELS[args.model].native_dimensions
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT embedding::text FROM entity_embedding
+            WHERE model = :model AND dimensions = :dims
+            LIMIT :rows
+        """), {"model": args.model, "dims": native, "rows": args.rows + args.queries}).scalars().all()
+    if len(rows) <= args.queries:
+        raise SystemExit(f"need more than {args.queries} {args.model} vectors, found {len(rows)}")
+    v = np.array([np.array(r[1:-1].split(","), dtype=np.float32) for r in rows])
+    return v[args.queries:], v[:args.queries]
+
+def load_synthetic(args):
+    rng = np.random.default_rng(args.seed)
+    dims = MODELS[args.model].native_dimensions
+    decay = (1.0 + np.arange(dims, dtype=np.float32)) ** -0.5
+    centers = rng.standard_normal((64, dims), dtype=np.float32) * decay
+    def sample(n):
+        picks = centers[rng.integers(0, len(centers), n)]
+        return picks + 0.6 * rng.standard_normal((n, dims), dtype=np.float32) * decay
+    return truncate(sample(args.rows), dims), truncate(sample(args.queries), dims)
+
+def top_k(corpus, queries, k):
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def pgvector_ms(args, corpus, queries, dims):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE TEMP TABLE bench_dims (id int, embedding vector({dims}))"))
+        literals = ["[" + ",".join(map(str, row)) + "]" for row in corpus.tolist()]
+        for start in range(0, len(literals), 5000):
+            conn.execute(text("""
+                INSERT INTO bench_dims
+                SELECT u.id, CAST(u.embedding AS vector)
+                FROM unnest(CAST(:ids AS int[]), CAST(:embeddings AS text[])) AS u(id, embedding)
+            """), {"ids": list(range(start, start + len(literals[start:start + 5000]))),
+                   "embeddings": literals[start:start + 5000]})
+        conn.execute(text("ANALYZE bench_dims"))
+        stmt = text("SELECT id FROM bench_dims ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k")
+        q = "[" + ",".join(map(str, queries[0].tolist())) + "]"
+        ms = timed(lambda: conn.execute(stmt, {"q": q, "k": args.k}).fetchall(), args.repeat)
+        conn.execute(text("DROP TABLE bench_dims"))
+        return ms
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", choices=("db", "synthetic"), default="synthetic")
+    ap.add_argument("--model", default="text-embedding-3-small", choices=[m for m, s in MODELS.items() if s.reducible])
+    ap.add_argument("--dims", default="64,128,256,512,1024,1536")
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--pgvector", action="store_true")
+    args = ap.parse_args()
+
+    corpus, queries = load_db(args) if args.source == "db" else load_synthetic(args)
+    native = corpus.shape[1]
+    truth = top_k(corpus, queries, args.k)
+    print(f"{args.source}: {len(corpus)} x {native} {args.model}, {len(queries)} queries, top-{args.k}")
+    print(f"{'dims':>6} {'MB':>8} {'numpy ms':>9} {'pgvector ms':>12} {'recall':>7}")
+    for dims in sorted({int(d) for d in args.dims.split(",") if 0 < int(d) <= native}):
+        small = truncate(corpus, dims)
+        small_q = truncate(queries, dims)
+        found = top_k(small, small_q, args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+        ms = timed(lambda: [np.argpartition(-(small @ q), args.k)[:args.k] for q in small_q], args.repeat) / len(small_q)
+        pg = f"{pgvector_ms(args, small, small_q, dims):>12.1f}" if args.pgvector else f"{'-':>12}"
+        print(f"{dims:>6} {small.nbytes / 2**20:>8.0f} {ms:>9.2f} {pg} {recall:>7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os, sys, argparse, statistics, tempfile, time, uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.core import entity_index as core
+
+# In-memory entity index (src/core/entity_index.py) at --records entities:
+# update and query latency of the hashed/inverted index against the
+# previous list-and-scan implementation, which is reproduced below. Also
+# checks that both return the same rows. Finally, the warm start: writing
+# and restoring a snapshot of the same records.
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+TYPES = ["task", "pipeline", "client", "event"]
+STATUSES = ["open", "in_progress", "blocked", "done"]
+WORDS = ("sync engine notion drift schema canonical onboarding pipeline client agent index vector "
+         "conflict retry webhook billing invoice roadmap launch review migration telemetry").split()
+
+QUERIES = {
+    "type": dict(entity_type="task"),
+    "type+status": dict(entity_type="task", filters={"status": "blocked"}),
+    "assignee+priority": dict(filters={"assignee": "user7", "priority": "high"}),
+    "tag": dict(tags=["phase3"]),
+    "tags x2 + type": dict(entity_type="task", tags=["phase3", "webhook"]),
+    "text word": dict(search_text="invoice"),
+    "text phrase": dict(search_text="billing invoice"),
+    "text substring": dict(search_text="ratio"),
+    "type+text+sort": dict(entity_type="task", search_text="webhook", sort_field="canonical_id", sort_dir="asc"),
+    "owner (no index)": dict(filters={"owner": "user3"}),
+}
+
+def synthetic_entity(i):
+    # an `entity` table row
+    words = [WORDS[(i * 7 + k * 3) % len(WORDS)] for k in range(10)]
+    return SimpleNamespace(
+        id=uuid.UUID(int=i + 1),
+        entity_type=TYPES[i % len(TYPES)],
+        canonical_id=f"{TYPES[i % len(TYPES)].upper()}-{i}",
+        title=" ".join(words[:4]),
+        summary=" ".join(words) + f" ref{i}",
+        tags=[words[0], f"phase{i % 20}"],
+        status=STATUSES[i % len(STATUSES)],
+        priority=("low", "medium", "high")[i % 3],
+        assignee=f"user{i % 50}",
+        owner=f"user{i % 13}",
+        due_date=None,
+        updated_at=BASE + timedelta(seconds=i % 60),
+    )
+
+class LinearIndex:
+    """
+    The list-based index this module replaced.
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def update(self, record):
+        self.rows = [r for r in self.rows if r.entity_id != record.entity_id]
+        self.rows.append(record)
+
+    def query(self, entity_type=None, filters=None, tags=None, search_text=None, limit=50, sort_field=None, sort_dir="desc"):
+        results = self.rows
+        if entity_type:
+            results = [r for r in results if r.entity_type == entity_type]
+        if filters:
+            for k, v in filters.items():
+                results = [r for r in results if getattr(r, k, None) == v]
+        if tags:
+            results = [r for r in results if set(tags).issubset(set(r.tags))]
+        if search_text:
+            results = [r for r in results if search_text.lower() in r.search_vector]
+        if sort_field:
+            results = sorted(results, key=lambda r: getattr(r, sort_field, None), reverse=(sort_dir == "desc"))
+        return results[:limit]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=100_000)
+    ap.add_argument("--updates", type=int, default=200, help="single-record updates timed after the load")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    records = [core.build_index_record(synthetic_entity(i)) for i in range(args.records)]
+    linear = LinearIndex()
+    linear.rows = list(records)
+    scratch = tempfile.mkdtemp()
+    snapshot = os.path.join(scratch, "entity_index.snapshot")
+    core.load_index(path=snapshot)  # no snapshot yet: starts empty, without a db
+    started = time.perf_counter()
+    for r in records:
+        core.entity_index.put(r)
+    load_s_cold = time.perf_counter() - started
+    print(f"{args.records} records; indexed load {load_s_cold:.2f}s, "
+          f"{len(core.entity_index.tokens)} distinct tokens, {len(core.entity_index.tags)} tags")
+
+    step = max(1, args.records // args.updates)
+    changed = [core.build_index_record(synthetic_entity(i)) for i in range(0, args.records, step)][:args.updates]
+    linear_ms = timed(lambda: [linear.update(r) for r in changed], 1) / len(changed)
+    indexed_ms = timed(lambda: [core.entity_index.put(r) for r in changed], 1) / len(changed)
+    print(f"\n{'operation':<20} {'linear ms':>10} {'indexed ms':>11} {'speedup':>8} {'rows':>5}")
+    print(f"{'update one':<20} {linear_ms:>10.3f} {indexed_ms:>11.4f} {linear_ms / indexed_ms:>7.0f}x {'':>5}")
+
+    for label, q in QUERIES.items():
+        expected = linear.query(**q)
+        got = core.query_entities(**q)
+        if [r.entity_id for r in got] != [r.entity_id for r in expected]:
+            raise SystemExit(f"{label}: results differ from the linear scan")
+        linear_ms = timed(lambda: linear.query(**q), args.repeat)
+        indexed_ms = timed(lambda: core.query_entities(**q), args.repeat)
+        print(f"{label:<20} {linear_ms:>10.2f} {indexed_ms:>11.3f} {linear_ms / indexed_ms:>7.0f}x {len(got):>5}")
+
+    save_s = timed(lambda: core.save_snapshot(snapshot), 1) / 1000
+    size = os.path.getsize(snapshot) / 2**20
+    open_ms = timed(lambda: core.EntityIndexSnapshot(snapshot).close(), args.repeat)
+    load_s = timed(lambda: core.load_index(path=snapshot), 1) / 1000
+    text_s = timed(lambda: core.query_entities(search_text="invoice"), 1) / 1000
+    for label, q in QUERIES.items():
+        if [r.entity_id for r in core.query_entities(**q)] != [r.entity_id for r in linear.query(**q)]:
+            raise SystemExit(f"{label}: results differ after restoring the snapshot")
+    print(f"\nsnapshot {size:.1f} MB: save {save_s:.2f}s, open {open_ms:.2f} ms, load {load_s:.2f}s "
+          f"+ text index on first search {text_s:.2f}s (cold build {load_s_cold:.2f}s)")
+    os.remove(snapshot)
+    os.rmdir(scratch)
+
+if __name__ == "__main__":
+    main()
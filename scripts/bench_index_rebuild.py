@@ -0,0 +1,91 @@
+import os, sys, argparse, json, multiprocessing, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.indexing import index_row, parallel_rebuild
+
+# Index rebuild throughput at 1..8 worker processes.
+#   --source synthetic  the client-side work of a rebuild (entity row ->
+#                       index row -> jsonb payload) over generated entities,
+#                       split across the same spawned process pool; no DB
+#   --source db         parallel_rebuild against DATABASE_URL. Without
+#                       --truncate every run after the first finds the index
+#                       up to date; with it entity_index is emptied before
+#                       each run (use a scratch database).
+TYPES = ["task", "pipeline", "client", "event", "speaker", "note", "project", "doc"]
+STATUSES = ["open", "in_progress", "blocked", "done"]
+WORDS = "sync engine notion drift schema canonical onboarding pipeline client agent index vector".split()
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def synthetic_entity(i):
+    words = [WORDS[(i * 7 + k) % len(WORDS)] for k in range(12)]
+    return SimpleNamespace(
+        id=uuid.UUID(int=i + 1),
+        entity_type=TYPES[i % len(TYPES)],
+        canonical_id=f"TASK-{i}",
+        title=" ".join(words[:5]).title(),
+        summary=" ".join(words) * 4,
+        tags=[WORDS[i % len(WORDS)], f"phase{i % 20}"],
+        status=STATUSES[i % len(STATUSES)],
+        priority=("low", "medium", "high")[i % 3],
+        assignee=f"user{i % 50}",
+        owner=f"user{i % 13}",
+        due_date=BASE + timedelta(days=i % 365),
+        updated_at=BASE + timedelta(seconds=i),
+    )
+
+def build_payloads(start, stop, chunk_size):
+    payload_bytes = 0
+    for chunk in range(start, stop, chunk_size):
+        rows = [index_row(synthetic_entity(i)) for i in range(chunk, min(chunk + chunk_size, stop))]
+        payload_bytes += len(json.dumps(rows))
+    return payload_bytes
+
+def synthetic_run(rows, workers, chunk_size):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pool.submit(int).result()  # start-up is not part of the rebuild
+        started = time.perf_counter()
+        bounds = [rows * i // workers for i in range(workers + 1)]
+        list(pool.map(build_payloads, bounds[:-1], bounds[1:], [chunk_size] * workers))
+        return time.perf_counter() - started
+
+def db_run(workers, chunk_size, truncate):
+    if truncate:
+        from sqlalchemy import text
+        from db.session import get_session
+        with get_session() as db:
+            db.execute(text("TRUNCATE entity_index"))
+            db.commit()
+    return parallel_rebuild(workers, chunk_size=chunk_size, resume=False).seconds
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", choices=("synthetic", "db"), default="synthetic")
+    ap.add_argument("--rows", type=int, default=200_000, help="synthetic entities")
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--chunk-size", type=int, default=5000)
+    ap.add_argument("--truncate", action="store_true")
+    args = ap.parse_args()
+
+    print(f"{args.source}, {multiprocessing.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'seconds':>8} {'rows/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        if args.source == "synthetic":
+            seconds, rows = synthetic_run(args.rows, workers, args.chunk_size), args.rows
+        else:
+            from sqlalchemy import text
+            from db.session import get_session
+            with get_session() as db:
+                rows = db.execute(text("SELECT count(*) FROM entity")).scalar()
+            seconds = db_run(workers, args.chunk_size, args.truncate)
+        baseline = baseline or seconds
+        print(f"{workers:>7} {seconds:>8.2f} {rows / seconds:>9.0f} {baseline / seconds:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
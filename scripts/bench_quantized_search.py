@@ -0,0 +1,142 @@
+import os, sys, argparse, statistics, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.query_engine.embedding_models import truncate
+
+# Recall@k and latency of the quantized candidate search (migration 023):
+# top k * factor candidates by halfvec cosine or binary hamming distance,
+# re-ranked exactly against the float32 vectors. Ground truth is exact
+# float32 top-k.
+#   --source db         stored vectors of --model/--dims from entity_embedding
+#                       (DATABASE_URL); held-out rows act as queries
+#   --source synthetic  clustered unit vectors
+# --pgvector also times the same two-stage statements in a temp table.
+
+def load_db(args):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT embedding::text FROM entity_embedding
+            WHERE model = :model AND dimensions = :dims
+            LIMIT :rows
+        """), {"model": args.model, "dims": args.dims, "rows": args.rows + args.queries}).scalars().all()
+    if len(rows) <= args.queries:
+        raise SystemExit(f"need more than {args.queries} {args.model} vectors, found {len(rows)}")
+    v = np.array([np.array(r[1:-1].split(","), dtype=np.float32) for r in rows])
+    return v[args.queries:], v[:args.queries]
+
+def load_synthetic(args):
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((256, args.dims), dtype=np.float32)
+    def sample(n):
+        picks = centers[rng.integers(0, len(centers), n)]
+        return picks + 1.5 * rng.standard_normal((n, args.dims), dtype=np.float32)
+    return truncate(sample(args.rows), args.dims), truncate(sample(args.queries), args.dims)
+
+def sign_bits(v):
+    # binary_quantize(): one bit per dimension, set when the value is > 0
+    return np.packbits(v > 0, axis=-1)
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def smallest(distances, n):
+    n = min(n, len(distances))
+    part = np.argpartition(distances, n - 1)[:n]
+    return part[np.argsort(distances[part])]
+
+def rerank(corpus, q, candidates, k):
+    return candidates[smallest(-(corpus[candidates] @ q), k)]
+
+def searchers(corpus, k):
+    half = corpus.astype(np.float16)
+    bits = sign_bits(corpus)
+    return {
+        "float32": (corpus.nbytes, lambda q, n: smallest(-(corpus @ q), k)),
+        "halfvec": (half.nbytes, lambda q, n: rerank(corpus, q, smallest(-(half @ q.astype(np.float16)), n), k)),
+        "binary": (bits.nbytes, lambda q, n: rerank(
+            corpus, q, smallest(np.bitwise_count(bits ^ sign_bits(q)).sum(axis=1, dtype=np.int32), n), k)),
+    }
+
+PG_QUERIES = {
+    "float32": "SELECT id FROM bench_quantized ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k",
+    "halfvec": """
+        SELECT id FROM (
+            SELECT id, embedding FROM bench_quantized
+            ORDER BY embedding_half <=> CAST(CAST(:q AS vector) AS halfvec) LIMIT :n
+        ) c ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k""",
+    "binary": """
+        SELECT id FROM (
+            SELECT id, embedding FROM bench_quantized
+            ORDER BY embedding_bits <~> binary_quantize(CAST(:q AS vector)) LIMIT :n
+        ) c ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k""",
+}
+
+def pgvector_ms(args, corpus, queries, factors):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(os.environ["DATABASE_URL"])
+    out = {}
+    with engine.connect() as conn:
+        conn.execute(text(f"""
+            CREATE TEMP TABLE bench_quantized (
+                id int, embedding vector({args.dims}),
+                embedding_half halfvec({args.dims}), embedding_bits bit({args.dims}))
+        """))
+        literals = ["[" + ",".join(map(str, row)) + "]" for row in corpus.tolist()]
+        for start in range(0, len(literals), 5000):
+            conn.execute(text("""
+                INSERT INTO bench_quantized
+                SELECT u.id, CAST(u.e AS vector), CAST(u.e AS vector)::halfvec, binary_quantize(CAST(u.e AS vector))
+                FROM unnest(CAST(:ids AS int[]), CAST(:embeddings AS text[])) AS u(id, e)
+            """), {"ids": list(range(start, start + len(literals[start:start + 5000]))),
+                   "embeddings": literals[start:start + 5000]})
+        conn.execute(text("ANALYZE bench_quantized"))
+        q = "[" + ",".join(map(str, queries[0].tolist())) + "]"
+        for mode, sql in PG_QUERIES.items():
+            for factor in factors if mode != "float32" else (1,):
+                params = {"q": q, "k": args.k, "n": args.k * factor}
+                out[mode, factor] = timed(lambda: conn.execute(text(sql), params).fetchall(), args.repeat)
+        conn.execute(text("DROP TABLE bench_quantized"))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", choices=("db", "synthetic"), default="synthetic")
+    ap.add_argument("--model", default="text-embedding-3-small")
+    ap.add_argument("--dims", type=int, default=1536)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--factors", default="1,2,4,10,20", help="re-rank factors (candidates = k * factor)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--pgvector", action="store_true")
+    args = ap.parse_args()
+
+    corpus, queries = load_db(args) if args.source == "db" else load_synthetic(args)
+    args.dims = corpus.shape[1]
+    factors = [int(f) for f in args.factors.split(",")]
+    search = searchers(corpus, args.k)
+    truth = [set(search["float32"][1](q, args.k)) for q in queries]
+    pg = pgvector_ms(args, corpus, queries, factors) if args.pgvector else {}
+    print(f"{args.source}: {len(corpus)} x {args.dims}, {len(queries)} queries, top-{args.k}, median of {args.repeat}")
+    print(f"{'storage':<8} {'factor':>6} {'MB':>8} {'numpy ms':>9} {'pgvector ms':>12} {'recall':>7}")
+    for mode, (nbytes, fn) in search.items():
+        for factor in factors if mode != "float32" else (1,):
+            n = args.k * factor
+            recall = np.mean([len(truth[i] & set(fn(q, n))) / args.k for i, q in enumerate(queries)])
+            ms = timed(lambda: [fn(q, n) for q in queries], args.repeat) / len(queries)
+            pg_ms = f"{pg[mode, factor]:>12.1f}" if pg else f"{'-':>12}"
+            print(f"{mode:<8} {factor:>6} {nbytes / 2**20:>8.0f} {ms:>9.2f} {pg_ms} {recall:>7.3f}")
+
+if __name__ == "__main__":
+    main()
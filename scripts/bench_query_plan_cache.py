@@ -0,0 +1,84 @@
+import os, sys, argparse, random, time
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import models.entity  # noqa: F401  (EntityIndex.entity needs Entity mapped)
+from models.entity_index import EntityIndex
+from services.query_engine.parser import parse_query_args
+from services.query_engine.service import QueryService
+from services.query_engine.plan_cache import plan_cache
+
+# Query shapes from tests/test_query_engine.py; values are varied per run the
+# way agents vary them, so only the shape repeats.
+SHAPES = [
+    lambda r: ["tasks", f"status:{r.choice(['open', 'blocked', 'done'])}"],
+    lambda r: ["tasks", f"tag:phase{r.randint(1, 40)}"],
+    lambda r: ["tasks", "status:in_progress", f"tag:{r.choice(['engine', 'sync', 'ops'])}", "priority:high"],
+    lambda r: ["any", "--search", r.choice(["canonical sync engine", "notion drift", "ops queue"])],
+    lambda r: ["pipelines", "--sort updated_at:asc", "--limit", str(r.randint(1, 20))],
+    lambda r: ["clients", f"status:{r.choice(['nonexistent', 'active'])}"],
+]
+
+def legacy_statement(criteria):
+    # QueryService.search as it was before the plan cache: values inlined
+    query = select(EntityIndex)
+    if criteria.entity_type:
+        query = query.where(EntityIndex.entity_type == criteria.entity_type)
+    for field, value in (criteria.filters or {}).items():
+        col = getattr(EntityIndex, field, None)
+        if col is not None:
+            query = query.where(col == value)
+    for tag in criteria.tags or []:
+        query = query.where(text(f"'{tag}' = ANY(tags)"))
+    if criteria.search_text:
+        ts_query = text("plainto_tsquery('simple', :search)")
+        query = query.where(EntityIndex.search_vector.op('@@')(ts_query))
+        query = query.params(search=criteria.search_text)
+    if criteria.sort_field:
+        sort_col = getattr(EntityIndex, criteria.sort_field)
+        query = query.order_by(sort_col.asc() if criteria.sort_dir == "asc" else sort_col.desc())
+    else:
+        query = query.order_by(EntityIndex.updated_at.desc())
+    return query.limit(criteria.limit)
+
+def cached_statement(criteria):
+    statement, _ = QueryService.plan(criteria)
+    return statement
+
+def run(build, iterations, seed):
+    """
+    Per-query client overhead: build the statement, derive its cache key and
+    compile on a miss, mirroring what Connection.execute does before any I/O.
+    """
+    rng = random.Random(seed)
+    dialect = postgresql.dialect()
+    compiled_cache = {}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        criteria = parse_query_args(rng.choice(SHAPES)(rng))
+        statement = build(criteria)
+        key = statement._generate_cache_key().key
+        if key not in compiled_cache:
+            compiled_cache[key] = statement.compile(dialect=dialect)
+    elapsed = time.perf_counter() - started
+    return elapsed / iterations * 1e6, len(compiled_cache)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    plan_cache.clear()
+    legacy_us, legacy_compiles = run(legacy_statement, args.iterations, args.seed)
+    cached_us, cached_compiles = run(cached_statement, args.iterations, args.seed)
+    print(f"{'path':<10} {'us/query':>10} {'compiles':>10}")
+    print(f"{'legacy':<10} {legacy_us:>10.1f} {legacy_compiles:>10}")
+    print(f"{'cached':<10} {cached_us:>10.1f} {cached_compiles:>10}")
+    print(f"plan cache: {plan_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os, sys, argparse, statistics, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import models.entity  # noqa: F401  (EntityIndex.entity needs Entity mapped)
+from db.session import get_session
+from services.query_engine.parser import parse_query_args
+from services.query_engine.service import QueryService
+
+# A context-building pass as an agent issues it: the current task's
+# neighbourhood by status, tag, assignee and free text.
+CONTEXT_QUERIES = [
+    ["tasks", "status:open"],
+    ["tasks", "status:in_progress"],
+    ["tasks", "status:blocked"],
+    ["tasks", "priority:high"],
+    ["tasks", "status:open", "priority:high"],
+    ["tasks", "tag:phase14"],
+    ["tasks", "tag:engine"],
+    ["tasks", "tag:sync"],
+    ["tasks", "status:in_progress", "tag:engine", "priority:high"],
+    ["pipelines", "--limit", "10"],
+    ["pipelines", "status:active"],
+    ["clients", "--limit", "10"],
+    ["clients", "status:active"],
+    ["events", "--limit", "10"],
+    ["any", "--search", "canonical sync engine"],
+    ["any", "--search", "notion drift"],
+    ["any", "--search", "schema violation"],
+    ["tasks", "--search", "onboarding"],
+    ["tasks", "--sort updated_at:asc", "--limit", "5"],
+    ["any", "--limit", "20"],
+]
+
+def serial(db, criteria_list):
+    return [QueryService.search(db, c, use_cache=False) for c in criteria_list]
+
+def batched(db, criteria_list):
+    return QueryService.search_many(db, criteria_list)
+
+def timed(fn, db, criteria_list, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = fn(db, criteria_list)
+        samples.append((time.perf_counter() - started) * 1000)
+        db.expunge_all()
+    return statistics.median(samples), sum(len(r) for r in results)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    criteria_list = [parse_query_args(list(q)) for q in CONTEXT_QUERIES]
+    with get_session() as db:
+        # warm both plans so the comparison is round trips, not compilation
+        serial(db, criteria_list)
+        batched(db, criteria_list)
+        serial_ms, serial_rows = timed(serial, db, criteria_list, args.repeat)
+        batch_ms, batch_rows = timed(batched, db, criteria_list, args.repeat)
+    print(f"{len(criteria_list)} queries, median of {args.repeat} runs")
+    print(f"{'path':<10} {'ms':>10} {'round trips':>12} {'rows':>8}")
+    print(f"{'serial':<10} {serial_ms:>10.1f} {len(criteria_list):>12} {serial_rows:>8}")
+    print(f"{'batched':<10} {batch_ms:>10.1f} {1:>12} {batch_rows:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os, argparse, statistics, time
+from sqlalchemy import create_engine, text
+
+# Synthetic corpus for entity_index full-text benchmarks. Requires the
+# entity_index_search_vector() function from migrations/018.
+SETUP = """
+CREATE TEMP TABLE bench_entity_index AS
+SELECT
+    gen_random_uuid() AS id,
+    'task' AS entity_type,
+    'TASK-' || g AS canonical_id,
+    (ARRAY['sync', 'notion', 'engine', 'pipeline', 'canonical', 'drift', 'client', 'speaker'])[1 + g % 8]
+        || ' ' || md5(g::text) AS title,
+    repeat((ARRAY['schema', 'trigger', 'audit', 'event', 'relation', 'onboarding'])[1 + g % 6] || ' ', 1 + g % 7)
+        || md5((g * 7)::text) AS summary,
+    ARRAY[(ARRAY['phase14', 'engine', 'ops', 'k12'])[1 + g % 4]] AS tags,
+    now() - (g || ' seconds')::interval AS updated_at
+FROM generate_series(1, :rows) AS g;
+ALTER TABLE bench_entity_index ADD COLUMN search_vector tsvector;
+UPDATE bench_entity_index SET search_vector = entity_index_search_vector(title, summary, tags);
+CREATE INDEX ON bench_entity_index USING GIN (search_vector);
+CREATE INDEX ON bench_entity_index (updated_at);
+ANALYZE bench_entity_index;
+"""
+
+UNRANKED = """
+SELECT id, title FROM bench_entity_index
+WHERE search_vector @@ plainto_tsquery('simple', :q)
+ORDER BY updated_at DESC LIMIT :limit
+"""
+
+RANKED = """
+SELECT id, title,
+       ts_rank_cd(search_vector, plainto_tsquery('simple', :q)) AS rank,
+       ts_headline('simple', concat_ws(' ', title, summary), plainto_tsquery('simple', :q),
+                   'StartSel=[, StopSel=], MaxFragments=2, MaxWords=20, MinWords=5') AS snippet
+FROM bench_entity_index
+WHERE search_vector @@ plainto_tsquery('simple', :q)
+ORDER BY rank DESC, updated_at DESC LIMIT :limit
+"""
+
+def timed(conn, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        for statement in SETUP.strip().split(";\n"):
+            conn.execute(text(statement), {"rows": args.rows})
+        print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s")
+        print(f"{'query':<22} {'unranked ms':>12} {'ranked ms':>12}")
+        # common title term, mid-frequency summary term, rare hash prefix
+        for q in ["sync", "onboarding schema", "canonical engine", "md5 miss"]:
+            params = {"q": q, "limit": args.limit}
+            print(f"{q:<22} {timed(conn, UNRANKED, params, args.repeat):>12.1f} "
+                  f"{timed(conn, RANKED, params, args.repeat):>12.1f}")
+
+if __name__ == "__main__":
+    main()
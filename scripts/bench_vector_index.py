@@ -0,0 +1,117 @@
+import os, sys, argparse, statistics, tempfile, time, uuid
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.query_engine.vector_index import LocalVectorIndex
+
+# Exact top-k: in-process memmapped index (float16 / int8) versus a pgvector
+# sequential scan over the same synthetic vectors. The pgvector side needs
+# DATABASE_URL and the vector extension; pass --pgvector to include it.
+TYPES = ["task", "pipeline", "client", "event", "speaker", "note", "project", "doc"]
+CHUNK = 50_000
+
+PG_TOP_K = """
+SELECT id FROM bench_vectors {where}
+ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k
+"""
+
+def chunk_vectors(seed, start, n, dims):
+    rng = np.random.default_rng(seed * 1_000_003 + start)
+    v = rng.standard_normal((n, dims), dtype=np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+def exact_top_k(args, queries, k):
+    scores = np.empty((len(queries), args.rows), dtype=np.float32)
+    for start in range(0, args.rows, CHUNK):
+        n = min(CHUNK, args.rows - start)
+        scores[:, start:start + n] = queries @ chunk_vectors(args.seed, start, n, args.dims).T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+def build(args, dtype, path):
+    index = LocalVectorIndex("bench", args.dims, path=path, dtype=dtype)
+    started = time.perf_counter()
+    for start in range(0, args.rows, CHUNK):
+        n = min(CHUNK, args.rows - start)
+        rows = range(start, start + n)
+        index.upsert(
+            [uuid.UUID(int=i + 1) for i in rows],
+            [uuid.UUID(int=i + 1) for i in rows],
+            [TYPES[i % len(TYPES)] for i in rows],
+            ["open" if i % 3 else "done" for i in rows],
+            chunk_vectors(args.seed, start, n, args.dims),
+        )
+    index._save_meta()
+    return index, time.perf_counter() - started
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def bench_pgvector(args, queries):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE TEMP TABLE bench_vectors (id int, entity_type text, embedding vector({args.dims}))"))
+        for start in range(0, args.rows, CHUNK):
+            n = min(CHUNK, args.rows - start)
+            v = chunk_vectors(args.seed, start, n, args.dims)
+            conn.execute(text("""
+                INSERT INTO bench_vectors
+                SELECT u.id, u.entity_type, CAST(u.embedding AS vector)
+                FROM unnest(CAST(:ids AS int[]), CAST(:types AS text[]), CAST(:embeddings AS text[]))
+                     AS u(id, entity_type, embedding)
+            """), {
+                "ids": list(range(start, start + n)),
+                "types": [TYPES[i % len(TYPES)] for i in range(start, start + n)],
+                "embeddings": ["[" + ",".join(map(str, row)) + "]" for row in v.tolist()],
+            })
+        conn.execute(text("ANALYZE bench_vectors"))
+        out = {}
+        for label, where in (("all", ""), ("type=task", "WHERE entity_type = 'task'")):
+            stmt = text(PG_TOP_K.format(where=where))
+            q = "[" + ",".join(map(str, queries[0].tolist())) + "]"
+            out[label] = timed(lambda: conn.execute(stmt, {"q": q, "k": args.k}).fetchall(), args.repeat)
+        return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--dims", type=int, default=1536)
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--queries", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--pgvector", action="store_true")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.standard_normal((args.queries, args.dims), dtype=np.float32)
+    truth = exact_top_k(args, queries, args.k)
+    print(f"{args.rows} vectors x {args.dims} dims, top-{args.k}, median of {args.repeat}")
+    print(f"{'backend':<16} {'build s':>8} {'MB':>8} {'all ms':>8} {'type ms':>8} {'recall':>7}")
+    for dtype in ("float16", "int8"):
+        with tempfile.TemporaryDirectory() as path:
+            index, build_s = build(args, dtype, path)
+            size = index.vectors[:args.rows].nbytes / 2**20
+            search = lambda **kw: [index.search(q, args.k, **kw) for q in queries]
+            search()  # fault the memmap into the page cache
+            all_ms = timed(lambda: search(), args.repeat) / len(queries)
+            type_ms = timed(lambda: search(entity_type="task"), args.repeat) / len(queries)
+            recall = np.mean([
+                len(truth[i] & {h.int - 1 for h, _ in hits}) / args.k
+                for i, hits in enumerate(search())
+            ])
+            print(f"{'local ' + dtype:<16} {build_s:>8.1f} {size:>8.0f} {all_ms:>8.1f} {type_ms:>8.1f} {recall:>7.3f}")
+            del index
+    if args.pgvector:
+        pg = bench_pgvector(args, queries)
+        print(f"{'pgvector seqscan':<16} {'':>8} {'':>8} {pg['all']:>8.1f} {pg['type=task']:>8.1f} {1.0:>7.3f}")
+
+if __name__ == "__main__":
+    main()
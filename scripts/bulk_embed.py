@@ -0,0 +1,29 @@
+import os, sys, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import get_session
+from services.query_engine.bulk_embedder import BulkEmbedder, PENDING_CHUNK_SIZE
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-embed changed entities in batches")
+    ap.add_argument("--entity-type")
+    ap.add_argument("--batch-size", type=int, default=96)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--chunk-size", type=int, default=PENDING_CHUNK_SIZE, help="entities read per pass")
+    ap.add_argument("--force", action="store_true", help="re-embed even unchanged entities")
+    args = ap.parse_args()
+
+    embedder = BulkEmbedder(batch_size=args.batch_size, concurrency=args.concurrency, chunk_size=args.chunk_size)
+    with get_session() as db:
+        stats = embedder.run(
+            db,
+            entity_type=args.entity_type,
+            force=args.force,
+            progress=lambda s: print(f"  {s.entities} read, {s.embedded} embedded, {s.requests} requests", flush=True),
+        )
+    print(stats.render())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os, sys, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import get_session
+from services.query_engine.bulk_embedder import BulkEmbedder, RequestBudget
+from services.query_engine.embedding_worker import EmbeddingWorker
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-embed entities whose embedding is stale")
+    ap.add_argument("--batch-size", type=int, default=200, help="entities per checkpointed batch")
+    ap.add_argument("--request-size", type=int, default=96, help="inputs per embeddings request")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--rpm", type=float, default=300, help="embeddings requests per minute")
+    ap.add_argument("--once", action="store_true", help="drain the backlog and exit")
+    ap.add_argument("--poll", type=float, default=30, help="seconds between scans once caught up")
+    args = ap.parse_args()
+
+    embedder = BulkEmbedder(
+        batch_size=args.request_size,
+        concurrency=args.concurrency,
+        budget=RequestBudget(args.rpm),
+    )
+    worker = EmbeddingWorker(embedder, batch_size=args.batch_size)
+    with get_session() as db:
+        print(f"{worker.provider.space}: {worker.backlog(db)} stale entities")
+        try:
+            stats = worker.run(
+                db,
+                once=args.once,
+                poll=args.poll,
+                progress=lambda s: print(f"  {s.entities} seen, {s.embedded} embedded, "
+                                         f"{s.skipped} unchanged, {s.requests} requests", flush=True),
+            )
+        except KeyboardInterrupt:
+            stats = worker.stats
+    print(stats.render())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, for exercising the bulk
+embedder without network calls or cost:
+
+    python scripts/fake_embeddings_server.py --port 8765 --latency-ms 80 --throttle-every 25
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=local python scripts/bulk_embed.py
+
+Vectors are deterministic per input text, so cache hits can be checked.
+"""
+import argparse, hashlib, json, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+import numpy as np
+
+def fake_vector(text: str, dimensions: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dimensions)
+    return (v / np.linalg.norm(v)).round(6).tolist()
+
+def make_handler(args):
+    requests = count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *a):
+            if args.verbose:
+                super().log_message(fmt, *a)
+
+        def reply(self, status, payload, headers=()):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/embeddings"):
+                return self.reply(404, {"error": {"message": "not found"}})
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            n = next(requests)
+            if args.throttle_every and n % args.throttle_every == 0:
+                return self.reply(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                  [("Retry-After", str(args.retry_after))])
+            inputs = payload["input"]
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(args.latency_ms / 1000)
+            self.reply(200, {
+                "object": "list",
+                "model": payload.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_vector(t, args.dimensions)}
+                    for i, t in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+
+    return Handler
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--dimensions", type=int, default=1536)
+    ap.add_argument("--latency-ms", type=float, default=50)
+    ap.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with 429")
+    ap.add_argument("--retry-after", type=float, default=0.2)
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"fake embeddings on http://127.0.0.1:{args.port}/v1 ({args.dimensions} dims)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os, sys, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import get_session
+from services.indexing import IncrementalIndexer
+
+def main():
+    ap = argparse.ArgumentParser(description="Apply the entity_change log to entity_index")
+    ap.add_argument("--batch-size", type=int, default=1000, help="changes per committed batch")
+    ap.add_argument("--once", action="store_true", help="drain the log and exit")
+    ap.add_argument("--poll", type=float, default=5, help="seconds between checks once caught up")
+    args = ap.parse_args()
+
+    with get_session() as db:
+        indexer = IncrementalIndexer(db, batch_size=args.batch_size)
+        print(f"{indexer.backlog()} pending changes")
+        progress = lambda s: print(f"  {s.changes} changes, {s.entities} re-indexed, {s.removed} removed", flush=True)
+        try:
+            if args.once:
+                indexer.drain(progress)
+            else:
+                indexer.run(poll=args.poll, progress=progress)
+        except KeyboardInterrupt:
+            pass
+    print(indexer.stats.render())
+
+if __name__ == "__main__":
+    main()
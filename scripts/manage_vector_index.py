@@ -0,0 +1,66 @@
+import os, sys, argparse, time
+from sqlalchemy import text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import engine, get_session
+from services.query_engine.ann_index import (
+    SPACE_ROWS, ann_indexes, index_name, rebuild_index, recommended_lists,
+)
+
+# Show or rebuild the per-space ANN index on entity_embedding.embedding.
+# Without --rebuild, prints each (model, dimensions) space with its row
+# count, current indexes and the ivfflat lists its size calls for.
+#   --rebuild                     keep the current method, re-size lists
+#   --rebuild --method hnsw       switch to hnsw (--m, --ef-construction)
+# The replacement is built CONCURRENTLY beside the live index and swapped in.
+
+def describe(db):
+    indexes = ann_indexes(db, refresh=True)
+    spaces = db.execute(SPACE_ROWS).all()
+    for model, dims, rows in spaces:
+        print(f"{model}@{dims}: {rows} rows, recommended ivfflat lists = {recommended_lists(rows)}")
+        for index in indexes:
+            if (index.model, index.dimensions) == (model, dims):
+                options = ", ".join(f"{k}={v}" for k, v in index.options.items())
+                print(f"    {index.name}: {index.method} on {index.column} ({options})")
+    for index in indexes:
+        if index.model is None:
+            print(f"unscoped: {index.name}: {index.method} on {index.column}")
+    return indexes, spaces
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or rebuild entity_embedding ANN indexes")
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--model", help="only this model's space")
+    ap.add_argument("--dims", type=int, help="only this dimension count")
+    ap.add_argument("--method", choices=["ivfflat", "hnsw"], help="default: the space's current method, else ivfflat")
+    ap.add_argument("--lists", type=int, help="ivfflat lists (default: from the row count)")
+    ap.add_argument("--m", type=int, default=16, help="hnsw links per node")
+    ap.add_argument("--ef-construction", type=int, default=64, help="hnsw build candidate list")
+    ap.add_argument("--maintenance-work-mem", help="e.g. 2GB; builds are much faster when the graph fits")
+    args = ap.parse_args()
+
+    with get_session() as db:
+        indexes, spaces = describe(db)
+    if not args.rebuild:
+        return
+
+    current = {i.name: i.method for i in indexes}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if args.maintenance_work_mem:
+            conn.execute(text("SELECT set_config('maintenance_work_mem', :v, false)"), {"v": args.maintenance_work_mem})
+        for model, dims, rows in spaces:
+            if (args.model and model != args.model) or (args.dims and dims != args.dims):
+                continue
+            method = args.method or current.get(index_name(model, dims), "ivfflat")
+            lists = args.lists or recommended_lists(rows)
+            shape = f"lists = {lists}" if method == "ivfflat" else f"m = {args.m}, ef_construction = {args.ef_construction}"
+            print(f"{model}@{dims}: building {method} ({shape}) over {rows} rows ...", flush=True)
+            started = time.perf_counter()
+            rebuild_index(conn, model, dims, method, lists, args.m, args.ef_construction)
+            print(f"  swapped in after {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os, sys, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db.session import get_session
+from services.indexing import EntityIndexBuilder, REBUILD_CHUNK_SIZE, parallel_rebuild
+
+def main():
+    ap = argparse.ArgumentParser(description="Rebuild entity_index from entity in committed, resumable chunks")
+    ap.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE)
+    ap.add_argument("--restart", action="store_true", help="ignore a saved checkpoint and start from the first entity")
+    ap.add_argument("--workers", type=int, default=1, help="processes, each rebuilding one id range")
+    args = ap.parse_args()
+
+    if args.workers > 1:
+        stats = parallel_rebuild(
+            args.workers,
+            chunk_size=args.chunk_size,
+            resume=not args.restart,
+            progress=lambda total: print(f"  {total} indexed", flush=True),
+        )
+    else:
+        with get_session() as db:
+            stats = EntityIndexBuilder(db).rebuild_all_indexes(
+                chunk_size=args.chunk_size,
+                resume=not args.restart,
+                progress=lambda s: print(f"  {s.resumed_from + s.entities} indexed ({s.rate:.0f}/s)", flush=True),
+            )
+    print(stats.render())
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,11 @@ import hashlib
 from pathlib import Path
 from zoneinfo import ZoneInfo
 from sqlalchemy import create_engine, text
-from difflib import SequenceMatcher
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.fuzzy_match import FuzzyMatchService
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
@@ -114,10 +116,6 @@ def norm(s: str) -> str:
     return " ".join("".join(ch.lower() if ch.isalnum() else " " for ch in s).split())
 
 
-def score(a: str, b: str) -> float:
-    return SequenceMatcher(None, a, b).ratio()
-
-
 def fetch_candidates(engine, entity_type: str, limit: int = 50) -> list[dict]:
     sql = text(
         """
@@ -133,40 +131,37 @@ def fetch_candidates(engine, entity_type: str, limit: int = 50) -> list[dict]:
     return [{"title": r[0], "canonical_id": r[1]} for r in rows]
 
 
-def resolve_name_to_id(name: str, candidates: list[dict], min_score: float = 0.92) -> str | None:
+def resolve_name_to_id(engine, name: str, entity_type: str, min_score: float = 0.8) -> str | None:
     """
     Returns canonical_id if exactly one strong match is found.
-    Strategy:
+    Strategy (over the trigram top-k for the whole table, not a candidate list):
       1) exact normalized match
-      2) best fuzzy match with uniqueness + threshold
+      2) best trigram match with uniqueness + threshold
     """
     n = norm(name)
     if not n:
         return None
 
-    exact = [c for c in candidates if norm(c["title"]) == n]
+    with engine.begin() as conn:
+        matches = FuzzyMatchService.top_k(conn, name, entity_type=entity_type, k=5)
+
+    exact = [m for m in matches if norm(m.title or "") == n]
     if len(exact) == 1:
-        return exact[0]["canonical_id"]
+        return exact[0].canonical_id
     if len(exact) > 1:
         return None
 
-    scored = []
-    for c in candidates:
-        s = score(n, norm(c["title"]))
-        scored.append((s, c["canonical_id"], c["title"]))
-
-    scored.sort(reverse=True, key=lambda x: x[0])
-    if not scored:
+    if not matches:
         return None
 
-    best = scored[0]
-    if best[0] < min_score:
+    best = matches[0]
+    if best.similarity < min_score:
         return None
 
-    if len(scored) > 1 and (best[0] - scored[1][0]) < 0.03:
+    if len(matches) > 1 and (best.similarity - matches[1].similarity) < 0.03:
         return None
 
-    return best[1]
+    return best.canonical_id
 
 
 CACHE_DIR = Path(ROOT) / ".cache"
@@ -498,16 +493,12 @@ def main():
     if DATABASE_URL:
         if engine is None:
             engine = create_engine(DATABASE_URL)
-        if not client_candidates:
-            client_candidates = fetch_candidates(engine, "notion.client", limit=500)
-        if not event_candidates:
-            event_candidates = fetch_candidates(engine, "notion.event", limit=500)
 
         for t in tasks:
             if not t.get("client_ids") and t.get("client_names"):
                 resolved = []
                 for nm in t["client_names"]:
-                    cid = resolve_name_to_id(nm, client_candidates)
+                    cid = resolve_name_to_id(engine, nm, "notion.client")
                     if cid:
                         resolved.append(cid)
                 t["client_ids"] = list(dict.fromkeys(resolved))
@@ -517,7 +508,7 @@ def main():
             if not t.get("parent_event_ids") and t.get("event_names"):
                 resolved = []
                 for nm in t["event_names"]:
-                    eid = resolve_name_to_id(nm, event_candidates)
+                    eid = resolve_name_to_id(engine, nm, "notion.event")
                     if eid:
                         resolved.append(eid)
                 t["parent_event_ids"] = list(dict.fromkeys(resolved))
@@ -231,12 +231,12 @@ def upsert_entity_task(conn, canonical_id: str, title: str, metadata: dict, cont
 def upsert_embedding(conn, entity_id: int, vector: list[float]):
     conn.execute(text(
         """
-      INSERT INTO entity_embedding(entity_id, embedding, model)
-      VALUES (:eid, :emb::vector, :model)
-      ON CONFLICT (entity_id)
-      DO UPDATE SET embedding = EXCLUDED.embedding, model = EXCLUDED.model
+      INSERT INTO entity_embedding(entity_id, embedding, model, dimensions)
+      VALUES (:eid, CAST(:emb AS vector), :model, :dims)
+      ON CONFLICT (entity_id, model, dimensions)
+      DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
     """
-    ), {"eid": entity_id, "emb": str(vector), "model": OPENAI_EMBED_MODEL})
+    ), {"eid": entity_id, "emb": str(vector), "model": OPENAI_EMBED_MODEL, "dims": len(vector)})
 
 
 def ensure_relation(conn, source_id: int, target_id: int, rel_type: str):
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from sqlalchemy import text
+
+# `%` is the pg_trgm similarity operator; it is what lets the planner use the
+# GIN trigram indexes from migrations/019_entity_trigram_index.sql.
+MATCH_SQL = """
+    SELECT canonical_id, title, entity_type,
+           GREATEST(similarity(title, :q), similarity(canonical_id, :q)) AS score
+    FROM entity
+    WHERE (title % :q OR canonical_id % :q){type_filter}
+    ORDER BY score DESC, canonical_id
+    LIMIT :k
+"""
+MATCH_ANY = text(MATCH_SQL.format(type_filter=""))
+MATCH_TYPED = text(MATCH_SQL.format(type_filter=" AND entity_type = :entity_type"))
+SET_THRESHOLD = text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)")
+
+@dataclass(frozen=True)
+class FuzzyMatch:
+    canonical_id: str
+    title: Optional[str]
+    entity_type: str
+    similarity: float
+
+class FuzzyMatchService:
+    @staticmethod
+    def top_k(db, query: str, entity_type: Optional[str] = None, k: int = 5,
+              min_similarity: float = 0.3) -> List[FuzzyMatch]:
+        """
+        Return up to k entities whose title or canonical_id is most similar to
+        `query` (pg_trgm similarity, 0..1), best first. `db` may be a Session
+        or a Connection; the threshold is set for the current transaction only.
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        db.execute(SET_THRESHOLD, {"threshold": str(min_similarity)})
+        params = {"q": query, "k": k}
+        if entity_type:
+            params["entity_type"] = entity_type
+        rows = db.execute(MATCH_TYPED if entity_type else MATCH_ANY, params).fetchall()
+        return [FuzzyMatch(r[0], r[1], r[2], float(r[3])) for r in rows]
+
+    @staticmethod
+    def suggest_canonical_ids(db, query: str, k: int = 5) -> List[str]:
+        return [m.canonical_id for m in FuzzyMatchService.top_k(db, query, k=k)]
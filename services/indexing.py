@@ -1,7 +1,106 @@
+import json, queue, time, uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from models.entity import Entity
 from models.entity_index import EntityIndex
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
 from datetime import datetime
+from services.query_engine.result_cache import bump_index_version
+
+# entity columns copied verbatim into entity_index
+INDEX_FIELDS = (
+    "entity_type", "canonical_id", "title", "summary", "tags",
+    "status", "priority", "assignee", "owner", "due_date", "updated_at",
+)
+REBUILD_CHUNK_SIZE = 5000
+
+# One statement per chunk. Rows travel as a single jsonb array, which (unlike
+# unnest) keeps tags as a text[] per row. Rows whose indexed columns are
+# unchanged are left alone, so a rebuild over a fresh index writes nothing.
+# Nor is a row replaced by older state: with several indexers draining the
+# change log, one that read an entity earlier may commit after one that
+# read it later.
+UPSERT_INDEX = text(f"""
+INSERT INTO entity_index (entity_id, {", ".join(INDEX_FIELDS)})
+SELECT r.entity_id, {", ".join(f"r.{f}" for f in INDEX_FIELDS)}
+FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+    entity_id uuid, entity_type text, canonical_id text, title text, summary text, tags text[],
+    status text, priority text, assignee text, owner text, due_date timestamptz, updated_at timestamptz
+)
+ON CONFLICT (entity_id) DO UPDATE SET
+    {", ".join(f"{f} = EXCLUDED.{f}" for f in INDEX_FIELDS)}
+WHERE ({", ".join(f"entity_index.{f}" for f in INDEX_FIELDS)})
+      IS DISTINCT FROM ({", ".join(f"EXCLUDED.{f}" for f in INDEX_FIELDS)})
+  AND EXCLUDED.updated_at >= entity_index.updated_at
+""")
+GET_CHECKPOINT = text("SELECT last_entity_id, rows_done FROM index_rebuild_checkpoint WHERE name = :name")
+SET_CHECKPOINT = text("""
+INSERT INTO index_rebuild_checkpoint (name, last_entity_id, rows_done)
+VALUES (:name, :id, :rows)
+ON CONFLICT (name) DO UPDATE SET
+    last_entity_id = EXCLUDED.last_entity_id,
+    rows_done = EXCLUDED.rows_done,
+    updated_at = NOW()
+""")
+CLEAR_CHECKPOINT = text("DELETE FROM index_rebuild_checkpoint WHERE name = :name")
+
+# Claim the oldest changes; SKIP LOCKED lets several indexers share the log
+CLAIM_CHANGES = text("""
+DELETE FROM entity_change WHERE id IN (
+    SELECT id FROM entity_change ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED
+)
+RETURNING entity_id
+""")
+CHANGE_BACKLOG = text("SELECT count(*) FROM entity_change")
+MARK_EMBEDDINGS_STALE = text("""
+UPDATE entity_embedding SET stale = true
+WHERE entity_id = ANY(CAST(:entity_ids AS uuid[])) AND NOT stale
+""")
+
+def index_row(entity) -> dict:
+    """
+    The entity_index values for an entity (or an entity row), JSON-ready.
+    """
+    row = {"entity_id": str(entity.id)}
+    for field in INDEX_FIELDS:
+        value = getattr(entity, field)
+        row[field] = value.isoformat() if isinstance(value, datetime) else value
+    row["updated_at"] = row["updated_at"] or datetime.utcnow().isoformat()
+    return row
+
+@dataclass
+class ChangeStats:
+    changes: int = 0
+    entities: int = 0
+    removed: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    def render(self) -> str:
+        return (
+            f"{self.changes} changes in {self.batches} batches ({self.seconds:.1f}s): "
+            f"{self.entities} entities re-indexed, {self.removed} removed"
+        )
+
+@dataclass
+class RebuildStats:
+    entities: int = 0
+    chunks: int = 0
+    resumed_from: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.entities / self.seconds if self.seconds else 0.0
+
+    def render(self) -> str:
+        resumed = f" (resumed after {self.resumed_from})" if self.resumed_from else ""
+        return (
+            f"{self.entities} entities indexed in {self.seconds:.1f}s "
+            f"({self.rate:.0f} entities/sec, {self.chunks} chunks){resumed}"
+        )
 
 class EntityIndexBuilder:
     def __init__(self, db: Session):
@@ -23,12 +122,172 @@ class EntityIndexBuilder:
         index.owner = entity.owner
         index.due_date = entity.due_date
         index.updated_at = entity.updated_at or datetime.utcnow()
-        # Optionally set search_vector here
+        # search_vector is maintained by the trg_entity_index_search_vector trigger
         self.db.add(index)
         self.db.commit()
+        bump_index_version()
         return index
 
-    def rebuild_all_indexes(self):
-        entities = self.db.query(Entity).all()
-        for entity in entities:
-            self.build_index_for_entity(entity)
+    def rebuild_all_indexes(self, chunk_size: int = REBUILD_CHUNK_SIZE, progress=None,
+                            resume: bool = True, name: str = "full", id_range: tuple = (None, None)):
+        """
+        Stream entities in id order through a server-side cursor on a
+        separate connection and upsert entity_index a chunk at a time. Each
+        chunk commits together with a checkpoint (the last id written), so
+        an interrupted rebuild resumes after it; `resume=False` starts over.
+        `id_range` (exclusive low, inclusive high) restricts the run to one
+        partition. Returns RebuildStats.
+        """
+        stats = RebuildStats()
+        low, high = id_range
+        checkpoint = self.db.execute(GET_CHECKPOINT, {"name": name}).fetchone() if resume else None
+        if checkpoint:
+            low, stats.resumed_from = checkpoint
+        statement = select(Entity.id, *(getattr(Entity, f) for f in INDEX_FIELDS)).order_by(Entity.id)
+        if low is not None:
+            statement = statement.where(Entity.id > low)
+        if high is not None:
+            statement = statement.where(Entity.id <= high)
+        started = time.perf_counter()
+        with self.db.get_bind().connect() as reader:
+            result = reader.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+            for chunk in result.partitions(chunk_size):
+                rows = [index_row(entity) for entity in chunk]
+                self.db.execute(UPSERT_INDEX, {"rows": json.dumps(rows)})
+                stats.entities += len(rows)
+                stats.chunks += 1
+                self.db.execute(SET_CHECKPOINT, {
+                    "name": name, "id": rows[-1]["entity_id"], "rows": stats.resumed_from + stats.entities,
+                })
+                self.db.commit()
+                stats.seconds = time.perf_counter() - started
+                if progress:
+                    progress(stats)
+        self.db.execute(CLEAR_CHECKPOINT, {"name": name})
+        self.db.commit()
+        stats.seconds = time.perf_counter() - started
+        bump_index_version()
+        return stats
+
+class IncrementalIndexer:
+    """
+    Keeps entity_index current from the entity_change log (migration 025):
+    each batch claims changes, re-indexes the entities that still exist
+    (search_vector follows through its trigger), drops index rows of
+    deleted ones, flags their embeddings stale, and commits all of it with
+    the claim. Work is proportional to the number of changes.
+    """
+
+    def __init__(self, db: Session, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.stats = ChangeStats()
+
+    def backlog(self) -> int:
+        return self.db.execute(CHANGE_BACKLOG).scalar()
+
+    def run_batch(self) -> int:
+        """
+        Apply the next batch of changes. Returns the number of changes
+        consumed; 0 means the log is empty.
+        """
+        changes = self.db.execute(CLAIM_CHANGES, {"batch": self.batch_size}).scalars().all()
+        if not changes:
+            self.db.commit()
+            return 0
+        entity_ids = list({str(i) for i in changes})
+        statement = select(Entity.id, *(getattr(Entity, f) for f in INDEX_FIELDS)).where(Entity.id.in_(entity_ids))
+        rows = [index_row(entity) for entity in self.db.execute(statement)]
+        if rows:
+            self.db.execute(UPSERT_INDEX, {"rows": json.dumps(rows)})
+        gone = list(set(entity_ids) - {r["entity_id"] for r in rows})
+        if gone:
+            # normally already removed by ON DELETE CASCADE
+            self.db.query(EntityIndex).filter(EntityIndex.entity_id.in_(gone)).delete(synchronize_session=False)
+        self.db.execute(MARK_EMBEDDINGS_STALE, {"entity_ids": entity_ids})
+        self.db.commit()
+        bump_index_version()
+        self.stats.changes += len(changes)
+        self.stats.entities += len(rows)
+        self.stats.removed += len(gone)
+        self.stats.batches += 1
+        return len(changes)
+
+    def drain(self, progress=None):
+        """
+        Apply changes until the log is empty. Returns ChangeStats.
+        """
+        started = time.perf_counter()
+        while self.run_batch():
+            self.stats.seconds = time.perf_counter() - started
+            if progress:
+                progress(self.stats)
+        self.stats.seconds = time.perf_counter() - started
+        return self.stats
+
+    def run(self, poll: float = 5.0, progress=None):
+        """
+        Drain, then keep polling the log every `poll` seconds until
+        interrupted.
+        """
+        while True:
+            self.drain(progress)
+            time.sleep(poll)
+
+def id_partitions(workers: int) -> list:
+    """
+    `workers` (exclusive low, inclusive high) ranges covering the uuid
+    space evenly; entity ids are random (gen_random_uuid), so each range
+    holds about the same number of entities.
+    """
+    bounds = [uuid.UUID(int=(2 ** 128 * i) // workers) for i in range(1, workers)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+def _rebuild_partition(name, id_range, chunk_size, resume, updates):
+    # runs in a spawned worker, which imports db.session afresh and so
+    # opens its own engine and connections
+    from db.session import get_session
+    with get_session() as db:
+        report = lambda s: updates.put((name, s.resumed_from + s.entities))
+        stats = EntityIndexBuilder(db).rebuild_all_indexes(chunk_size, report, resume, name, id_range)
+    return stats
+
+def parallel_rebuild(workers: int, chunk_size: int = REBUILD_CHUNK_SIZE, progress=None, resume: bool = True):
+    """
+    rebuild_all_indexes split by id range across `workers` processes, each
+    partition checkpointed under its own name so a rerun with the same
+    worker count resumes every partition. `progress(total)` is called with
+    the rows done across all partitions as workers report. Returns the
+    merged RebuildStats.
+    """
+    ranges = id_partitions(workers)
+    names = [f"partition-{i + 1}-of-{workers}" for i in range(workers)]
+    context = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    with context.Manager() as manager, ProcessPoolExecutor(workers, mp_context=context) as pool:
+        updates = manager.Queue()
+        futures = [
+            pool.submit(_rebuild_partition, name, id_range, chunk_size, resume, updates)
+            for name, id_range in zip(names, ranges)
+        ]
+        done = dict.fromkeys(names, 0)
+        while not all(f.done() for f in futures):
+            try:
+                name, rows = updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            done[name] = rows
+            if progress:
+                progress(sum(done.values()))
+        parts = [f.result() for f in futures]
+    if progress:
+        # updates may still be queued when the last worker finishes; the
+        # merged stats are the final word
+        progress(sum(p.resumed_from + p.entities for p in parts))
+    bump_index_version()
+    return RebuildStats(
+        entities=sum(p.entities for p in parts),
+        chunks=sum(p.chunks for p in parts),
+        resumed_from=sum(p.resumed_from for p in parts),
+        seconds=time.perf_counter() - started,
+    )
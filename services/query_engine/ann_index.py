@@ -0,0 +1,161 @@
+import math, os, re
+from dataclasses import dataclass, field
+from typing import Optional
+from sqlalchemy import text
+
+# (setting, pgvector default) per ANN index method
+ANN_SETTINGS = {
+    "ivfflat": ("ivfflat.probes", 1),
+    "hnsw": ("hnsw.ef_search", 40),
+}
+
+# latency/recall trade-off applied per query: ivfflat probes as a fraction
+# of the index's lists, hnsw ef_search as a candidate-list size
+ANN_PROFILES = {
+    "fast": {"ivfflat": 0.01, "hnsw": 40},
+    "balanced": {"ivfflat": 0.05, "hnsw": 100},
+    "accurate": {"ivfflat": 0.2, "hnsw": 400},
+}
+DEFAULT_ANN_PROFILE = "balanced"
+HNSW_MAX_EF_SEARCH = 1000
+MAX_INDEXED_DIMENSIONS = 2000   # pgvector's limit for vector ivfflat/hnsw
+
+INDEX_DEFS = text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'entity_embedding'")
+
+SPACE_ROWS = text("""
+SELECT model, dimensions, count(*) AS n FROM entity_embedding
+GROUP BY model, dimensions ORDER BY n DESC
+""")
+
+@dataclass(frozen=True)
+class AnnIndex:
+    name: str
+    method: str                      # ivfflat | hnsw
+    column: str                      # embedding | embedding_half | embedding_bits
+    model: Optional[str] = None      # partial index space, None when unscoped
+    dimensions: Optional[int] = None
+    options: dict = field(default_factory=dict, hash=False)
+
+def parse_indexdef(name: str, indexdef: str) -> Optional[AnnIndex]:
+    method = re.search(r"USING (\w+)", indexdef)
+    if not method or method.group(1) not in ANN_SETTINGS:
+        return None
+    column = re.search(r"USING \w+ \(+(\w+)", indexdef)
+    options = dict(re.findall(r"(\w+)='?(\d+)'?", (re.search(r"WITH \(([^)]*)\)", indexdef) or [None, ""])[1]))
+    model = re.search(r"model = '((?:[^']|'')*)'", indexdef)
+    dims = re.search(r"dimensions = (\d+)", indexdef)
+    return AnnIndex(
+        name=name,
+        method=method.group(1),
+        column=column.group(1) if column else "embedding",
+        model=model.group(1).replace("''", "'") if model else None,
+        dimensions=int(dims.group(1)) if dims else None,
+        options={k: int(v) for k, v in options.items()},
+    )
+
+_ann_indexes = None
+
+def ann_indexes(db, refresh: bool = False) -> list:
+    """
+    ANN indexes present on entity_embedding, looked up once per process
+    unless `refresh` is set.
+    """
+    global _ann_indexes
+    if _ann_indexes is None or refresh:
+        found = (parse_indexdef(n, d) for n, d in db.execute(INDEX_DEFS).all())
+        _ann_indexes = [i for i in found if i is not None]
+    return _ann_indexes
+
+def ann_profile(name: Optional[str] = None) -> str:
+    name = name or os.getenv("IPE_ANN_PROFILE", DEFAULT_ANN_PROFILE)
+    if name not in ANN_PROFILES:
+        raise ValueError(f"ANN profile must be one of {', '.join(ANN_PROFILES)}, got {name!r}")
+    return name
+
+def ann_settings(db, profile: Optional[str] = None, rows: int = 0, space: tuple = None) -> dict:
+    """
+    {setting: value} under `profile` for the ANN indexes that can serve
+    `space` (model, dimensions). probes scale with the index's lists;
+    ef_search is at least `rows`, since hnsw never returns more rows than
+    its candidate list. Empty when no ANN index applies.
+    """
+    targets = ANN_PROFILES[ann_profile(profile)]
+    settings = {}
+    for index in ann_indexes(db):
+        if space and index.model is not None and (index.model, index.dimensions) != tuple(space):
+            continue
+        name, default = ANN_SETTINGS[index.method]
+        if index.method == "ivfflat":
+            value = max(1, math.ceil(index.options.get("lists", 100) * targets["ivfflat"]))
+        else:
+            value = min(max(targets["hnsw"], rows), HNSW_MAX_EF_SEARCH)
+        settings[name] = max(settings.get(name, default), value)
+    return settings
+
+def widened(settings: dict, factor: int) -> dict:
+    return {
+        name: min(value * factor, HNSW_MAX_EF_SEARCH) if name == "hnsw.ef_search" else value * factor
+        for name, value in settings.items()
+    }
+
+def apply_ann_settings(db, settings: dict):
+    """
+    All of `settings` in one round trip; transaction-local like SET LOCAL,
+    but with bound parameters.
+    """
+    if not settings:
+        return
+    calls = ", ".join(f"set_config(:n{i}, :v{i}, true)" for i in range(len(settings)))
+    params = {}
+    for i, (name, value) in enumerate(settings.items()):
+        params[f"n{i}"], params[f"v{i}"] = name, str(value)
+    db.execute(text(f"SELECT {calls}"), params)
+
+def recommended_lists(rows: int) -> int:
+    # pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+def index_name(model: str, dims: int, kind: str = "") -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_")
+    return f"idx_entity_embedding_{slug}_{dims}" + (f"_{kind}" if kind else "")
+
+def create_index_sql(name: str, model: str, dims: int, method: str, lists: int = None,
+                     m: int = 16, ef_construction: int = 64) -> str:
+    """
+    CREATE INDEX CONCURRENTLY for one (model, dimensions) space, on the
+    same vector(n) cast the query side uses.
+    """
+    if dims > MAX_INDEXED_DIMENSIONS:
+        raise ValueError(
+            f"{model}@{dims}: pgvector cannot index vectors over {MAX_INDEXED_DIMENSIONS} dimensions; "
+            f"use the halfvec copy (IPE_VECTOR_QUANTIZATION=halfvec) or reduced dimensions"
+        )
+    if method == "ivfflat":
+        options = f"lists = {int(lists)}"
+    elif method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    else:
+        raise ValueError(f"unknown ANN method {method!r}")
+    quoted = model.replace("'", "''")
+    return (
+        f"CREATE INDEX CONCURRENTLY {name} ON entity_embedding "
+        f"USING {method} ((embedding::vector({int(dims)})) vector_cosine_ops) "
+        f"WITH ({options}) "
+        f"WHERE model = '{quoted}' AND dimensions = {int(dims)}"
+    )
+
+def rebuild_index(conn, model: str, dims: int, method: str, lists: int = None,
+                  m: int = 16, ef_construction: int = 64):
+    """
+    Build the replacement beside the live index, then swap names, so search
+    keeps its index throughout. `conn` must be in autocommit mode.
+    """
+    name = index_name(model, dims)
+    building = f"{name}_rebuild"
+    # an interrupted CONCURRENTLY build leaves an invalid index behind
+    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {building}"))
+    conn.execute(text(create_index_sql(building, model, dims, method, lists, m, ef_construction)))
+    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"ALTER INDEX {building} RENAME TO {name}"))
@@ -0,0 +1,228 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from threading import Lock
+from sqlalchemy import text
+from models.entity import Entity
+from models.entity_embedding import EntityEmbedding
+from services.query_engine.embedding import semantic_representation
+from services.query_engine.embedding_providers import get_provider
+from services.query_engine.embedding_cache import embedding_cache, content_hash, vector_literal
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# entities read (and texts built) per pass of BulkEmbedder.run
+PENDING_CHUNK_SIZE = 2000
+
+UPSERT_EMBEDDINGS = text("""
+    INSERT INTO entity_embedding (entity_id, embedding, model, dimensions, content_hash, updated_at)
+    SELECT u.entity_id, CAST(u.embedding AS vector), :model, :dimensions, u.content_hash, NOW()
+    FROM unnest(CAST(:entity_ids AS uuid[]), CAST(:embeddings AS text[]), CAST(:content_hashes AS text[]))
+         AS u(entity_id, embedding, content_hash)
+    ON CONFLICT (entity_id, model, dimensions) DO UPDATE SET
+        embedding = EXCLUDED.embedding,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = EXCLUDED.updated_at
+""")
+
+@dataclass
+class BulkEmbedStats:
+    entities: int = 0
+    skipped: int = 0
+    cached: int = 0
+    embedded: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.entities / self.seconds if self.seconds else 0.0
+
+    def render(self) -> str:
+        return (
+            f"{self.entities} entities in {self.seconds:.1f}s ({self.rate:.1f} entities/sec): "
+            f"{self.embedded} embedded, {self.cached} from cache, {self.skipped} unchanged; "
+            f"{self.requests} requests, {self.retries} retries"
+        )
+
+def transient_errors() -> tuple:
+    """
+    Exception types for timeouts and dropped connections. The openai SDK's
+    own classes do not derive from the builtins and carry no status code.
+    """
+    try:
+        import openai
+    except ImportError:
+        return (ConnectionError, TimeoutError)
+    return (ConnectionError, TimeoutError, openai.APITimeoutError, openai.APIConnectionError)
+
+def retry_delay(exc, attempt: int, base: float, cap: float):
+    """
+    Seconds to wait before retrying `exc`, or None if it is not retryable.
+    Honours Retry-After when the server sends one.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status not in RETRYABLE_STATUS and not isinstance(exc, transient_errors()):
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return min(cap, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+class RequestBudget:
+    """
+    Paces embeddings requests to at most `per_minute`, spaced evenly and
+    shared by all worker threads.
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class BulkEmbedder:
+    """
+    Re-embeds entities in batches: many inputs per embeddings request, at
+    most `concurrency` requests in flight, and one upsert per batch. API
+    calls run on worker threads; all database work stays on the caller's
+    session.
+    """
+
+    def __init__(self, provider=None, batch_size: int = 96, concurrency: int = 4,
+                 max_retries: int = 6, backoff: float = 0.5, max_backoff: float = 30.0,
+                 budget: RequestBudget = None, chunk_size: int = PENDING_CHUNK_SIZE):
+        self.provider = provider or get_provider()
+        self.budget = budget
+        self.model = self.provider.model_id
+        self.dimensions = self.provider.dimensions
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.chunk_size = chunk_size
+        self._lock = Lock()
+
+    def _embed_batch(self, texts, stats):
+        for attempt in range(self.max_retries + 1):
+            if self.budget:
+                self.budget.acquire()
+            with self._lock:
+                stats.requests += 1
+            try:
+                return self.provider.embed(texts)
+            except Exception as exc:
+                delay = retry_delay(exc, attempt, self.backoff, self.max_backoff)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    stats.retries += 1
+                time.sleep(delay)
+
+    def pending(self, db, entity_type=None, force=False):
+        """
+        Yield (seen, rows) for each chunk of `chunk_size` entities in id
+        order: the number read, and (entity_id, text, digest) for those with
+        no vector in this provider's space or one built from different text.
+        Every chunk is its own keyset query, so callers can commit between
+        chunks and only one chunk is held in memory.
+        """
+        q = db.query(Entity, EntityEmbedding.content_hash).outerjoin(
+            EntityEmbedding,
+            (EntityEmbedding.entity_id == Entity.id)
+            & (EntityEmbedding.model == self.model)
+            & (EntityEmbedding.dimensions == self.dimensions),
+        )
+        if entity_type:
+            q = q.filter(Entity.entity_type == entity_type)
+        last_id = None
+        while True:
+            page = q if last_id is None else q.filter(Entity.id > last_id)
+            chunk = page.order_by(Entity.id).limit(self.chunk_size).all()
+            if not chunk:
+                return
+            rows = []
+            for entity, stored_hash in chunk:
+                body = semantic_representation(entity)
+                digest = content_hash(body)
+                if force or stored_hash != digest:
+                    rows.append((str(entity.id), body, digest))
+            last_id = chunk[-1][0].id
+            db.expunge_all()
+            yield len(chunk), rows
+            if len(chunk) < self.chunk_size:
+                return
+
+    def _write(self, db, rows, vectors):
+        db.execute(UPSERT_EMBEDDINGS, {
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "entity_ids": [entity_id for entity_id, _, _ in rows],
+            "embeddings": [vector_literal(vectors[digest]) for _, _, digest in rows],
+            "content_hashes": [digest for _, _, digest in rows],
+        })
+
+    def run(self, db, entity_type=None, force=False, progress=None) -> BulkEmbedStats:
+        stats = BulkEmbedStats()
+        started = time.perf_counter()
+        # embed each chunk as it is read: memory stays at one chunk, and
+        # progress starts with the first batch rather than after a full scan
+        for seen, rows in self.pending(db, entity_type, force):
+            stats.entities += seen
+            stats.skipped += seen - len(rows)
+            self.embed_rows(db, rows, stats, progress)
+            stats.seconds = time.perf_counter() - started
+            if progress:
+                progress(stats)
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def embed_rows(self, db, rows, stats: BulkEmbedStats, progress=None):
+        """
+        Embed and upsert (entity_id, text, digest) rows, committing per batch.
+        """
+        by_digest = {}
+        for row in rows:
+            by_digest.setdefault(row[2], []).append(row)
+
+        # entities whose exact text was embedded before need no request
+        cache_db = db if self.provider.remote else None
+        cached = embedding_cache.get_many(cache_db, self.provider.space, list(by_digest))
+        cached_digests = list(cached)
+        for start in range(0, len(cached_digests), self.batch_size):
+            digests = cached_digests[start:start + self.batch_size]
+            batch_rows = [row for d in digests for row in by_digest[d]]
+            self._write(db, batch_rows, cached)
+            db.commit()
+            stats.cached += len(batch_rows)
+
+        # identical text across entities is sent once
+        todo = [(digest, group[0][1]) for digest, group in by_digest.items() if digest not in cached]
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {
+                pool.submit(self._embed_batch, [body for _, body in batch], stats): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                vectors = dict(zip((digest for digest, _ in batch), future.result()))
+                batch_rows = [row for digest, _ in batch for row in by_digest[digest]]
+                embedding_cache.put_many(cache_db, self.provider.space, vectors)
+                self._write(db, batch_rows, vectors)
+                db.commit()
+                stats.embedded += len(batch_rows)
+                if progress:
+                    progress(stats)
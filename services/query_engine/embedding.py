@@ -1,34 +1,68 @@
 def semantic_representation(entity):
-    data = getattr(entity, 'data', {})
+    data = getattr(entity, 'data', None) or {
+        "title": entity.title,
+        "description": entity.summary,
+        "tags": entity.tags,
+        "status": entity.status,
+        "priority": entity.priority,
+    }
     return " ".join([
-        data.get("title", ""),
-        data.get("description", ""),
-        " ".join(data.get("tags", [])),
-        data.get("status", ""),
-        data.get("priority", ""),
+        data.get("title") or "",
+        data.get("description") or "",
+        " ".join(data.get("tags") or []),
+        data.get("status") or "",
+        data.get("priority") or "",
     ])
 
-from openai import OpenAI
-client = OpenAI()
+from services.query_engine.embedding_providers import get_provider
 
 def generate_embedding(text: str) -> list[float]:
-    response = client.embeddings.create(
-        model="text-embedding-3-large",
-        input=text
-    )
-    return response.data[0].embedding
+    return get_provider().embed_one(text)
+
+def generate_embeddings(texts: list[str]) -> list[list[float]]:
+    return get_provider().embed(texts)
+
+from services.query_engine.embedding_cache import embedding_cache, content_hash, QUERY_TTL_DAYS
+
+def cached_embedding(db, text: str, digest: str = None, ttl_days: float = QUERY_TTL_DAYS) -> list[float]:
+    """
+    Embedding for `text`, generated only if (space, sha256(text)) has not
+    been embedded recently. A new vector is written to embedding_cache in
+    the caller's transaction, expiring after `ttl_days` (None: never);
+    the caller commits. Local providers only use the in-process LRU:
+    recomputing is cheaper than a database round trip.
+    """
+    provider = get_provider()
+    digest = digest or content_hash(text)
+    if not provider.remote:
+        db = None
+    embedding = embedding_cache.get(db, provider.space, digest)
+    if embedding is None:
+        embedding = provider.embed_one(text)
+        embedding_cache.put(db, provider.space, digest, embedding, ttl_days)
+    return embedding
 
 from models.entity_embedding import EntityEmbedding
 from datetime import datetime
 
 def update_embedding_for_entity(db, entity):
+    provider = get_provider()
+    model, dimensions = provider.model_id, provider.dimensions
     text = semantic_representation(entity)
-    embedding = generate_embedding(text)
-    existing = db.query(EntityEmbedding).filter_by(entity_id=entity.id).one_or_none()
+    digest = content_hash(text)
+    existing = db.query(EntityEmbedding).filter_by(
+        entity_id=entity.id, model=model, dimensions=dimensions
+    ).one_or_none()
+    if existing and existing.content_hash == digest:
+        return  # text unchanged since it was last embedded
+    embedding = cached_embedding(db, text, digest, ttl_days=None)
     if existing:
         existing.embedding = embedding
+        existing.content_hash = digest
         existing.updated_at = datetime.utcnow()
     else:
-        new = EntityEmbedding(entity_id=entity.id, embedding=embedding)
+        new = EntityEmbedding(
+            entity_id=entity.id, embedding=embedding, model=model, dimensions=dimensions, content_hash=digest
+        )
         db.add(new)
     db.commit()
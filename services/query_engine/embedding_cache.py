@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+from sqlalchemy import text
+
+# Query text is cached for this many days (migration 026); entity text,
+# stored with no expiry, is kept until it is no longer needed
+QUERY_TTL_DAYS = float(os.getenv("IPE_QUERY_EMBEDDING_TTL_DAYS", "7"))
+
+LIVE = "(expires_at IS NULL OR expires_at > NOW())"
+LOOKUP = text(f"""
+    SELECT embedding::text FROM embedding_cache
+    WHERE model = :model AND content_hash = :content_hash AND {LIVE}
+""")
+# A row never gains an expiry it did not have; a later expiry wins
+STORE = text("""
+    INSERT INTO embedding_cache (model, content_hash, embedding, expires_at)
+    VALUES (:model, :content_hash, CAST(:embedding AS vector),
+            NOW() + make_interval(secs => CAST(:ttl AS double precision)))
+    ON CONFLICT (model, content_hash) DO UPDATE SET expires_at = CASE
+        WHEN embedding_cache.expires_at IS NULL OR EXCLUDED.expires_at IS NULL THEN NULL
+        ELSE GREATEST(embedding_cache.expires_at, EXCLUDED.expires_at)
+    END
+""")
+LOOKUP_MANY = text(f"""
+    SELECT content_hash, embedding::text FROM embedding_cache
+    WHERE model = :model AND content_hash = ANY(:content_hashes) AND {LIVE}
+""")
+STORE_MANY = text("""
+    INSERT INTO embedding_cache (model, content_hash, embedding)
+    SELECT :model, u.content_hash, CAST(u.embedding AS vector)
+    FROM unnest(CAST(:content_hashes AS text[]), CAST(:embeddings AS text[]))
+         AS u(content_hash, embedding)
+    ON CONFLICT (model, content_hash) DO UPDATE SET expires_at = NULL
+    WHERE embedding_cache.expires_at IS NOT NULL
+""")
+PRUNE = text("DELETE FROM embedding_cache WHERE expires_at <= NOW()")
+
+def content_hash(text_in: str) -> str:
+    return hashlib.sha256(text_in.encode("utf-8")).hexdigest()
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(str(float(x)) for x in vector) + "]"
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model, sha256 of input): an in-process LRU in front
+    of the embedding_cache table, so repeated query text costs neither a
+    network call nor a database round trip.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = Lock()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, db, model: str, digest: str):
+        key = (model, digest)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+        if db is not None:
+            row = db.execute(LOOKUP, {"model": model, "content_hash": digest}).fetchone()
+            if row is not None:
+                vector = json.loads(row[0])
+                self._remember(key, vector)
+                self.db_hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def put(self, db, model: str, digest: str, vector, ttl_days: float = None):
+        """
+        Remember `vector`, and write it to the table in a savepoint of the
+        caller's transaction, which the caller commits. `ttl_days` None
+        stores it with no expiry.
+        """
+        self._remember((model, digest), vector)
+        if db is not None:
+            ttl = None if ttl_days is None else ttl_days * 86400
+            with db.begin_nested():
+                db.execute(STORE, {
+                    "model": model, "content_hash": digest, "embedding": vector_literal(vector), "ttl": ttl,
+                })
+
+    def get_many(self, db, model: str, digests) -> dict:
+        """
+        {digest: vector} for every digest already embedded; one query for
+        whatever the LRU does not hold.
+        """
+        found = {}
+        missing = []
+        for digest in digests:
+            key = (model, digest)
+            with self._lock:
+                vector = self._memory.get(key)
+            if vector is not None:
+                found[digest] = vector
+            else:
+                missing.append(digest)
+        self.hits += len(found)
+        if missing and db is not None:
+            rows = db.execute(LOOKUP_MANY, {"model": model, "content_hashes": missing}).fetchall()
+            for digest, literal in rows:
+                found[digest] = json.loads(literal)
+            self.db_hits += len(rows)
+        self.misses += len(digests) - len(found)
+        return found
+
+    def put_many(self, db, model: str, vectors: dict):
+        # bulk writes skip the LRU so a re-embed does not evict query vectors
+        if db is not None and vectors:
+            db.execute(STORE_MANY, {
+                "model": model,
+                "content_hashes": list(vectors),
+                "embeddings": [vector_literal(v) for v in vectors.values()],
+            })
+
+    @staticmethod
+    def prune(db) -> int:
+        """
+        Delete expired rows; returns how many. The caller commits.
+        """
+        return db.execute(PRUNE).rowcount
+
+    def stats(self) -> dict:
+        return {"size": len(self._memory), "hits": self.hits, "db_hits": self.db_hits, "misses": self.misses}
+
+embedding_cache = EmbeddingCache()
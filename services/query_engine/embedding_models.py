@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+@dataclass(frozen=True)
+class EmbeddingModel:
+    name: str
+    native_dimensions: Optional[int]    # None: the model emits any requested size
+    reducible: bool                     # trained so a prefix of the vector is itself an embedding
+
+# Every (model, dimensions) pair stored in entity_embedding must resolve here
+MODELS = {
+    m.name: m for m in (
+        EmbeddingModel("text-embedding-3-small", 1536, True),
+        EmbeddingModel("text-embedding-3-large", 3072, True),
+        EmbeddingModel("text-embedding-ada-002", 1536, False),
+        EmbeddingModel("local-hash", None, False),
+    )
+}
+
+def resolve_dimensions(model: str, dimensions: Optional[int] = None) -> int:
+    """
+    The vector size to use for `model`: its native size unless a reduced
+    one is requested and the model supports truncation.
+    """
+    spec = MODELS.get(model)
+    if spec is None:
+        raise ValueError(f"Unknown embedding model '{model}'. Known: {', '.join(MODELS)}")
+    if spec.native_dimensions is None:
+        if not dimensions:
+            raise ValueError(f"{model} needs an explicit dimension")
+        return dimensions
+    if not dimensions or dimensions == spec.native_dimensions:
+        return spec.native_dimensions
+    if not spec.reducible:
+        raise ValueError(f"{model} only produces {spec.native_dimensions}-dimension vectors")
+    if not 0 < dimensions < spec.native_dimensions:
+        raise ValueError(f"{model} supports 1..{spec.native_dimensions} dimensions, not {dimensions}")
+    return dimensions
+
+def space_key(model: str, dimensions: int) -> str:
+    """
+    Name of a vector space. Only vectors with the same key are comparable.
+    """
+    return f"{model}@{dimensions}"
+
+def require_same_space(a: tuple, b: tuple):
+    if tuple(a) != tuple(b):
+        raise ValueError(
+            f"Refusing to compare {space_key(*a)} vectors with {space_key(*b)} vectors; "
+            "re-embed with scripts/bulk_embed.py or switch IPE_EMBEDDING_MODEL/IPE_EMBEDDING_DIMENSIONS"
+        )
+
+def truncate(vectors, dimensions: int) -> np.ndarray:
+    """
+    Matryoshka reduction: keep the first `dimensions` components and
+    re-normalise, as the API does when asked for fewer dimensions.
+    """
+    v = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(v, axis=-1, keepdims=True)
+    return np.divide(v, norms, out=np.zeros_like(v), where=norms > 0)
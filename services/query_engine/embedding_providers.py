@@ -0,0 +1,127 @@
+import os
+import re
+from abc import ABC, abstractmethod
+import zlib
+from threading import Lock
+import numpy as np
+from services.query_engine.embedding_models import resolve_dimensions, space_key
+
+DEFAULT_MODEL = "text-embedding-3-small"
+LOCAL_DIMENSIONS = 1536
+TOKEN = re.compile(r"\w+")
+
+class EmbeddingProvider(ABC):
+    """
+    Turns text into vectors. `model_id` and `dimensions` together name the
+    vector space (`space`): vectors are cached and stored under it, and only
+    vectors from the same space are comparable. `remote` providers are worth
+    caching in the database; local ones are cheaper to recompute than to
+    look up.
+    """
+    model_id: str
+    dimensions: int
+    remote: bool = True
+
+    @property
+    def space(self) -> str:
+        return space_key(self.model_id, self.dimensions)
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    def embed_one(self, text: str) -> list[float]:
+        return self.embed([text])[0]
+
+class OpenAIProvider(EmbeddingProvider):
+    def __init__(self, model: str = DEFAULT_MODEL, dimensions: int = None):
+        self.model_id = model
+        self.dimensions = resolve_dimensions(model, dimensions)
+        # only ask for a size when it differs from the model's native one
+        self._reduced = dimensions is not None and dimensions != resolve_dimensions(model)
+        self._client = None
+
+    @property
+    def client(self):
+        # created on first use so importing the query engine needs no API key
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client
+
+    def embed(self, texts):
+        kwargs = {"dimensions": self.dimensions} if self._reduced else {}
+        response = self.client.embeddings.create(model=self.model_id, input=texts, **kwargs)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+class HashingProvider(EmbeddingProvider):
+    """
+    Offline signed feature hashing over lowercased words and their character
+    trigrams, L2-normalised. No model to load and no network; lexical rather
+    than semantic similarity, which is enough for tests and local work.
+    """
+    remote = False
+
+    def __init__(self, dimensions: int = LOCAL_DIMENSIONS):
+        self.model_id = "local-hash"
+        self.dimensions = resolve_dimensions(self.model_id, dimensions)
+
+    @staticmethod
+    def features(text: str):
+        for word in TOKEN.findall(text.lower()):
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, body in enumerate(texts):
+            indices, values = [], []
+            for feature, weight in self.features(body):
+                h = zlib.crc32(feature.encode("utf-8"))
+                indices.append(h % self.dimensions)
+                values.append(weight if h & 0x80000000 else -weight)
+            if indices:
+                np.add.at(out[row], indices, values)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out.tolist()
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "local": HashingProvider,
+}
+
+_provider = None
+_lock = Lock()
+
+def provider_from_env() -> EmbeddingProvider:
+    """
+    IPE_EMBEDDING_PROVIDER selects the backend (openai or local; default
+    openai). IPE_EMBEDDING_MODEL (or the sync script's OPENAI_EMBED_MODEL)
+    and IPE_EMBEDDING_DIMENSIONS override its defaults; a reduced dimension
+    must be one the model registry allows.
+    """
+    name = os.getenv("IPE_EMBEDDING_PROVIDER", "openai")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Allowed: {', '.join(PROVIDERS)}")
+    kwargs = {}
+    if os.getenv("IPE_EMBEDDING_DIMENSIONS"):
+        kwargs["dimensions"] = int(os.environ["IPE_EMBEDDING_DIMENSIONS"])
+    model = os.getenv("IPE_EMBEDDING_MODEL") or os.getenv("OPENAI_EMBED_MODEL")
+    if name == "openai" and model:
+        kwargs["model"] = model
+    return PROVIDERS[name](**kwargs)
+
+def get_provider() -> EmbeddingProvider:
+    global _provider
+    with _lock:
+        if _provider is None:
+            _provider = provider_from_env()
+        return _provider
+
+def set_provider(provider: EmbeddingProvider):
+    global _provider
+    with _lock:
+        _provider = provider
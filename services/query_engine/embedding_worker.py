@@ -0,0 +1,148 @@
+import time
+from datetime import datetime
+from sqlalchemy import text
+from models.entity import Entity
+from services.query_engine.embedding import semantic_representation
+from services.query_engine.embedding_cache import content_hash, embedding_cache
+from services.query_engine.bulk_embedder import BulkEmbedStats
+
+# An entity is stale when its space has no vector for it, the entity
+# changed after the vector was written, or the change log flagged it.
+STALE = """
+    FROM entity e
+    LEFT JOIN entity_embedding ee
+           ON ee.entity_id = e.id AND ee.model = :model AND ee.dimensions = :dimensions
+    WHERE (ee.id IS NULL OR ee.stale OR e.updated_at > ee.updated_at)
+"""
+STALE_BATCH = text(f"""
+    SELECT e.id, e.updated_at, ee.content_hash
+    {STALE}
+      AND (e.updated_at, e.id) > (:after_ts, :after_id)
+    ORDER BY e.updated_at, e.id
+    LIMIT :batch
+""")
+STALE_COUNT = text(f"SELECT count(*) {STALE}")
+TOUCH = text("""
+    UPDATE entity_embedding SET updated_at = NOW()
+    WHERE model = :model AND dimensions = :dimensions AND entity_id = ANY(CAST(:entity_ids AS uuid[]))
+""")
+GET_CHECKPOINT = text("""
+    SELECT last_updated_at, last_entity_id FROM embedding_worker_checkpoint WHERE space = :space
+""")
+SET_CHECKPOINT = text("""
+    INSERT INTO embedding_worker_checkpoint (space, last_updated_at, last_entity_id)
+    VALUES (:space, :ts, :id)
+    ON CONFLICT (space) DO UPDATE SET
+        last_updated_at = EXCLUDED.last_updated_at,
+        last_entity_id = EXCLUDED.last_entity_id,
+        updated_at = NOW()
+""")
+START = (datetime(1970, 1, 1), "00000000-0000-0000-0000-000000000000")
+
+class EmbeddingWorker:
+    """
+    Re-embeds stale entities a batch at a time, walking them in
+    (updated_at, id) order from a checkpoint saved after every batch, so a
+    restarted worker resumes where it stopped. Entities whose text hashes
+    to the stored content_hash only have their vector's updated_at bumped.
+    Request rate is bounded by the embedder's RequestBudget.
+    """
+
+    def __init__(self, embedder, batch_size: int = 200, telemetry_interval: float = 60.0):
+        self.embedder = embedder
+        self.provider = embedder.provider
+        self.batch_size = batch_size
+        self.telemetry_interval = telemetry_interval
+        self.stats = BulkEmbedStats()
+        self._flushed = (0, time.monotonic())
+
+    @property
+    def space(self) -> dict:
+        return {"model": self.provider.model_id, "dimensions": self.provider.dimensions}
+
+    def backlog(self, db) -> int:
+        return db.execute(STALE_COUNT, self.space).scalar()
+
+    def checkpoint(self, db):
+        row = db.execute(GET_CHECKPOINT, {"space": self.provider.space}).fetchone()
+        return (row[0], str(row[1])) if row and row[0] else START
+
+    def save_checkpoint(self, db, ts, entity_id):
+        db.execute(SET_CHECKPOINT, {"space": self.provider.space, "ts": ts, "id": entity_id})
+        db.commit()
+
+    def run_batch(self, db) -> int:
+        """
+        Process the next batch after the checkpoint. Returns the number of
+        stale entities seen; 0 means the pass reached the end and the
+        checkpoint was rewound for the next one.
+        """
+        after_ts, after_id = self.checkpoint(db)
+        stale = db.execute(STALE_BATCH, {
+            **self.space, "after_ts": after_ts, "after_id": after_id, "batch": self.batch_size,
+        }).fetchall()
+        if not stale:
+            self.save_checkpoint(db, *START)
+            return 0
+        stored = {row[0]: row[2] for row in stale}
+        entities = db.query(Entity).filter(Entity.id.in_(list(stored))).all()
+        rows, unchanged = [], []
+        for entity in entities:
+            body = semantic_representation(entity)
+            digest = content_hash(body)
+            if stored[entity.id] == digest:
+                unchanged.append(str(entity.id))
+            else:
+                rows.append((str(entity.id), body, digest))
+        db.expunge_all()
+        if unchanged:
+            db.execute(TOUCH, {**self.space, "entity_ids": unchanged})
+            db.commit()
+        self.embedder.embed_rows(db, rows, self.stats)
+        self.stats.entities += len(stale)
+        self.stats.skipped += len(unchanged)
+        last = stale[-1]
+        self.save_checkpoint(db, last[1], str(last[0]))
+        return len(stale)
+
+    def flush_telemetry(self, db, force: bool = False):
+        """
+        Record `embedding_backlog` (stale entities left) and
+        `embedding_throughput` (entities per minute since the last flush).
+        """
+        from services.telemetry_repository import TelemetryRepository
+        now = time.monotonic()
+        done, since = self._flushed
+        if not force and now - since < self.telemetry_interval:
+            return
+        per_minute = (self.stats.entities - done) * 60.0 / max(now - since, 1e-9)
+        timestamp = datetime.utcnow()
+        meta = {"space": self.provider.space}
+        TelemetryRepository.add(db, 'embedding_backlog', self.backlog(db), timestamp, meta)
+        TelemetryRepository.add(db, 'embedding_throughput', round(per_minute), timestamp,
+                                {**meta, "requests": self.stats.requests, "retries": self.stats.retries})
+        self._flushed = (self.stats.entities, now)
+
+    def run(self, db, once: bool = False, poll: float = 30.0, progress=None):
+        """
+        Drain the backlog; with once=False keep polling for newly stale
+        entities every `poll` seconds until interrupted.
+        """
+        started = time.perf_counter()
+        try:
+            while True:
+                seen = self.run_batch(db)
+                self.stats.seconds = time.perf_counter() - started
+                if progress and seen:
+                    progress(self.stats)
+                self.flush_telemetry(db)
+                if not seen:
+                    # caught up: a good moment to drop expired query vectors
+                    embedding_cache.prune(db)
+                    db.commit()
+                    if once:
+                        break
+                    time.sleep(poll)
+        finally:
+            self.flush_telemetry(db, force=True)
+        return self.stats
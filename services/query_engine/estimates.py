@@ -0,0 +1,31 @@
+from typing import Optional
+from sqlalchemy import text
+
+# reltuples is maintained by VACUUM/ANALYZE; -1 means never analyzed
+TABLE_ESTIMATE = text("""
+    SELECT reltuples::bigint FROM pg_class WHERE oid = 'entity_index'::regclass
+""")
+
+# Share of rows per entity_type from the column's most-common-values stats
+TYPE_FREQUENCY = text("""
+    SELECT mcv.freq
+    FROM pg_stats s,
+         unnest(s.most_common_vals::text::text[], s.most_common_freqs) AS mcv(val, freq)
+    WHERE s.tablename = 'entity_index' AND s.attname = 'entity_type' AND mcv.val = :entity_type
+""")
+
+def estimated_count(db, entity_type: Optional[str] = None) -> Optional[int]:
+    """
+    Planner-statistics row count for entity_index, optionally for one
+    entity_type. Returns None when statistics are missing so callers can fall
+    back to an exact count.
+    """
+    total = db.execute(TABLE_ESTIMATE).scalar()
+    if total is None or total < 0:
+        return None
+    if not entity_type:
+        return int(total)
+    freq = db.execute(TYPE_FREQUENCY, {"entity_type": entity_type}).scalar()
+    if freq is None:
+        return None
+    return int(round(total * freq))
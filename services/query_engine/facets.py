@@ -0,0 +1,56 @@
+from sqlalchemy import select, func, true, tuple_
+from models.entity_index import EntityIndex
+
+# Facets that can be counted; "tags" is counted per element of the array
+FACET_FIELDS = ("entity_type", "status", "priority", "assignee", "owner", "tags")
+
+def parse_facets(value: str) -> list[str]:
+    facets = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in facets if f not in FACET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown facet(s): {', '.join(unknown)}. Choose from {', '.join(FACET_FIELDS)}")
+    return facets
+
+def build_facet_statement(where: list, facets: tuple):
+    """
+    Count every requested facet over the filtered rows in one statement:
+    GROUP BY GROUPING SETS ((status), (priority), (tag), ()) where tag comes
+    from a lateral unnest(tags). The empty set yields the total match count.
+    """
+    base = select(EntityIndex.id, *[getattr(EntityIndex, f) for f in facets]).where(*where).cte("facet_base")
+    source = base
+    columns = {}
+    for facet in facets:
+        if facet == "tags":
+            tag = func.unnest(base.c.tags).table_valued("tag").render_derived().lateral("facet_tag")
+            source = source.outerjoin(tag, true())
+            columns[facet] = tag.c.tag
+        else:
+            columns[facet] = base.c[facet]
+    # unnest fans rows out per tag, so count entities rather than joined rows
+    count = func.count(base.c.id.distinct()).label("n")
+    grouping = [func.grouping(columns[f]).label(f"g_{f}") for f in facets]
+    sets = [tuple_(columns[f]) for f in facets] + [tuple_()]
+    return (
+        select(*[columns[f].label(f) for f in facets], *grouping, count)
+        .select_from(source)
+        .group_by(func.grouping_sets(*sets))
+    )
+
+def rows_to_facets(rows, facets: tuple) -> dict:
+    """
+    Split grouping-set rows into {"total": n, facet: [(value, count), ...]},
+    each facet ordered by count descending.
+    """
+    result = {"total": 0, **{f: [] for f in facets}}
+    for row in rows:
+        mapping = row._mapping
+        grouped = [f for f in facets if mapping[f"g_{f}"] == 0]
+        if not grouped:
+            result["total"] = mapping["n"]
+        else:
+            facet = grouped[0]
+            result[facet].append((mapping[facet], mapping["n"]))
+    for facet in facets:
+        result[facet].sort(key=lambda item: (-item[1], str(item[0])))
+    return result
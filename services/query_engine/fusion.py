@@ -0,0 +1,78 @@
+from sqlalchemy import select, func, bindparam, case, literal_column, Float, Integer
+from models.entity_index import EntityIndex
+from models.entity_embedding import EntityEmbedding
+from services.query_engine.service import build_where, _rank, _ts_query, HEADLINE_OPTIONS
+
+# Reciprocal rank fusion: score = w_text / (RRF_K + text rank) + w_vector / (RRF_K + vector rank)
+RRF_K = 60
+RRF_POOL = 100            # candidates taken from each ranking before fusing
+DEFAULT_WEIGHTS = (1.0, 1.0)
+
+def parse_weights(value: str) -> list[float]:
+    """
+    "--weights 0.3,0.7" -> [text weight, vector weight].
+    """
+    try:
+        weights = [float(w) for w in value.split(",")]
+    except ValueError:
+        weights = []
+    if len(weights) != 2 or any(w < 0 for w in weights) or not any(weights):
+        raise ValueError("--weights takes two non-negative numbers: <text>,<vector>")
+    return weights
+
+def build_fusion_statement(shape: tuple, distance, space: list):
+    """
+    Full-text and vector rankings of the same filtered rows, each cut to
+    :pool candidates, full-outer-joined and ordered by fused score. `shape`
+    is a filter shape with search set; `distance` is the embedding distance
+    expression to rank by and `space` the clauses restricting embeddings to
+    the query's model.
+    """
+    filters = build_where(shape[:5] + (False,))
+    matches = build_where(shape[:5] + (True,))
+    text_rank = _rank()
+    text_order = [text_rank.desc(), EntityIndex.updated_at.desc()]
+    fts = (
+        select(EntityIndex.id, func.row_number().over(order_by=text_order).label("r"))
+        .where(*matches)
+        .order_by(*text_order)
+        .limit(bindparam("pool", type_=Integer))
+        .cte("fts")
+    )
+    vec = (
+        select(EntityIndex.id, func.row_number().over(order_by=distance).label("r"))
+        .join(EntityEmbedding, EntityEmbedding.entity_id == EntityIndex.entity_id)
+        .where(*space, *filters)
+        .order_by(distance)
+        .limit(bindparam("pool", type_=Integer))
+        .cte("vec")
+    )
+    score = (
+        func.coalesce(bindparam("w_text", type_=Float) / (RRF_K + fts.c.r), 0)
+        + func.coalesce(bindparam("w_vector", type_=Float) / (RRF_K + vec.c.r), 0)
+    )
+    fused = (
+        select(
+            func.coalesce(fts.c.id, vec.c.id).label("id"),
+            score.label("score"),
+            fts.c.r.label("text_rank"),
+        )
+        .select_from(fts.outerjoin(vec, fts.c.id == vec.c.id, full=True))
+        .subquery("fused")
+    )
+    # only full-text hits get a highlighted snippet
+    snippet = case(
+        (fused.c.text_rank.isnot(None), func.ts_headline(
+            literal_column("'simple'"),
+            func.concat_ws(" ", EntityIndex.title, EntityIndex.summary),
+            _ts_query(),
+            HEADLINE_OPTIONS,
+        )),
+        else_=None,
+    )
+    return (
+        select(EntityIndex, fused.c.score.label("rank"), snippet.label("snippet"))
+        .join(fused, fused.c.id == EntityIndex.id)
+        .order_by(fused.c.score.desc(), EntityIndex.updated_at.desc())
+        .limit(bindparam("limit", type_=Integer))
+    )
@@ -8,8 +8,17 @@ class QueryCriteria:
     tags: List[str] = None                  # tag filters
     search_text: Optional[str] = None       # full-text search
     semantic_text: Optional[str] = None     # semantic search text
-    limit: int = 50                         # default limit
+    limit: Optional[int] = 50               # default limit, None = unbounded
     sort_field: Optional[str] = None
     sort_dir: Optional[str] = "desc"         # asc|desc
     assignee: Optional[str] = None          # dedicated filter
     owner: Optional[str] = None
+    cursor: Optional[str] = None            # keyset cursor on (updated_at, id)
+    stream: bool = False                    # yield rows incrementally
+    facets: List[str] = None                # fields to count instead of listing rows
+    explain: bool = False                   # report stage timings and query plans
+    fields: List[str] = None                # project only these columns
+    count: bool = False                     # return the match count only
+    estimate: bool = False                  # allow planner-statistics counts
+    weights: List[float] = None             # [text, vector] fusion weights for --search + --semantic
+    ann_profile: Optional[str] = None       # fast|balanced|accurate ANN recall, None = IPE_ANN_PROFILE
@@ -0,0 +1,30 @@
+import base64
+import uuid
+from datetime import datetime
+
+def encode_cursor(updated_at: datetime, row_id) -> str:
+    """
+    Encode the (updated_at, id) keyset position of a row into an opaque token.
+    """
+    raw = f"{updated_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Decode a token produced by encode_cursor back into (updated_at, id).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        ts, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), uuid.UUID(row_id)
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+
+def next_cursor(results, limit):
+    """
+    Return the cursor for the page after `results`, or None on the last page.
+    """
+    if not results or limit is None or len(results) < limit:
+        return None
+    last = results[-1]
+    return encode_cursor(last.updated_at, last.id)
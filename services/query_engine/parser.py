@@ -1,4 +1,8 @@
 from services.query_engine.models import QueryCriteria
+from services.query_engine.facets import parse_facets
+from services.query_engine.projection import parse_fields
+from services.query_engine.fusion import parse_weights
+from services.query_engine.ann_index import ann_profile
 
 def parse_query_args(args: list[str]) -> QueryCriteria:
     """
@@ -10,10 +14,20 @@ def parse_query_args(args: list[str]) -> QueryCriteria:
     search_text = None
     semantic_text = None
     limit = 50
+    limit_given = False
     sort_field = None
     sort_dir = "desc"
     assignee = None
     owner = None
+    cursor = None
+    stream = False
+    facets = None
+    explain = False
+    fields = None
+    count = False
+    estimate = False
+    weights = None
+    recall = None
 
     # Identify first arg if it's entity_type
     if args and not args[0].startswith("--") and ":" not in args[0]:
@@ -39,11 +53,37 @@ def parse_query_args(args: list[str]) -> QueryCriteria:
         elif token == "--limit":
             i += 1
             limit = int(args[i])
+            limit_given = True
+        elif token == "--cursor":
+            i += 1
+            cursor = args[i]
+        elif token == "--stream":
+            stream = True
+        elif token == "--explain":
+            explain = True
+        elif token == "--count":
+            count = True
+        elif token == "--estimate":
+            estimate = True
+        elif token == "--fields":
+            i += 1
+            fields = parse_fields(args[i])
+        elif token == "--weights":
+            i += 1
+            weights = parse_weights(args[i])
+        elif token == "--ann-profile":
+            i += 1
+            recall = ann_profile(args[i])
+        elif token == "--facets":
+            i += 1
+            facets = parse_facets(args[i])
         elif token.startswith("--sort"):
             # format: --sort field:asc
             _, sort_info = token.split(" ", 1)
             sort_field, sort_dir = sort_info.split(":", 1)
         i += 1
+    if stream and not limit_given:
+        limit = None  # streaming exports everything unless capped explicitly
     if "assignee" in filters:
         assignee = filters.pop("assignee")
     if "owner" in filters:
@@ -59,4 +99,13 @@ def parse_query_args(args: list[str]) -> QueryCriteria:
         sort_dir=sort_dir,
         assignee=assignee,
         owner=owner,
+        cursor=cursor,
+        stream=stream,
+        facets=facets,
+        explain=explain,
+        fields=fields,
+        count=count,
+        estimate=estimate,
+        weights=weights,
+        ann_profile=recall,
     )
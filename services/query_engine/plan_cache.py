@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from threading import Lock
+
+class QueryPlanCache:
+    """
+    Bounded LRU of built statements keyed by criteria shape.
+
+    A shape captures which clauses a query uses but none of its values, so
+    every query with the same shape reuses one statement object, and with it
+    SQLAlchemy's compiled-statement cache and the server's prepared plan.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_build(self, shape, builder):
+        with self._lock:
+            plan = self._plans.get(shape)
+            if plan is not None:
+                self._plans.move_to_end(shape)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        plan = builder()
+        with self._lock:
+            self._plans[shape] = plan
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._plans), "hits": self.hits, "misses": self.misses}
+
+plan_cache = QueryPlanCache()
@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager, nullcontext
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.compiler import compiles
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) wrapper around a statement. Compiling the inner
+    statement in the same pass keeps its bound parameters and type processing.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS) " + compiler.process(element.statement, **kw)
+
+class StageTiming:
+    def __init__(self, name: str):
+        self.name = name
+        self.ms = 0.0
+        self.rows = None
+
+class QueryProfile:
+    """
+    Collects wall time per stage, row counts and the statements executed by
+    one query so they can be explained afterwards.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.statements = []
+        self.plans = []
+
+    @contextmanager
+    def stage(self, name: str):
+        timing = StageTiming(name)
+        started = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.ms = (time.perf_counter() - started) * 1000
+            self.stages.append(timing)
+
+    def record(self, label: str, statement, params: dict):
+        self.statements.append((label, statement, params))
+
+    def explain(self, db):
+        """
+        Run EXPLAIN (ANALYZE, BUFFERS) for every recorded statement. ANALYZE
+        executes the statement again, which is safe for these read-only queries.
+        """
+        for label, statement, params in self.statements:
+            rows = db.execute(Explain(statement), params).fetchall()
+            self.plans.append((label, [row[0] for row in rows]))
+        return self.plans
+
+    def total_ms(self) -> float:
+        return sum(s.ms for s in self.stages)
+
+    def render(self) -> str:
+        lines = ["=== Query Profile ==="]
+        for s in self.stages:
+            rows = f"   rows={s.rows}" if s.rows is not None else ""
+            lines.append(f"{s.name:<10} {s.ms:>9.2f} ms{rows}")
+        lines.append(f"{'total':<10} {self.total_ms():>9.2f} ms")
+        for label, plan in self.plans:
+            lines.append(f"\n--- EXPLAIN (ANALYZE, BUFFERS): {label} ---")
+            lines.extend(plan)
+        return "\n".join(lines)
+
+def stage(profile, name: str):
+    """
+    Time a stage on `profile`, or do nothing when profiling is off.
+    """
+    if profile is None:
+        return nullcontext(StageTiming(name))
+    return profile.stage(name)
@@ -0,0 +1,42 @@
+from collections import namedtuple
+from functools import lru_cache
+from models.entity_index import EntityIndex
+
+# Columns that can be projected; search_vector is internal to full-text search
+PROJECTABLE_FIELDS = tuple(c.name for c in EntityIndex.__table__.c if c.name != "search_vector")
+# Always selected so projected rows can still be paged by (updated_at, id)
+KEY_FIELDS = ("id", "updated_at")
+# Full result rows: every column plus the full-text/fused rank and snippet
+RESULT_FIELDS = PROJECTABLE_FIELDS + ("rank", "snippet")
+
+def parse_fields(value: str) -> list[str]:
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(PROJECTABLE_FIELDS)}")
+    return fields
+
+def projected_fields(fields) -> tuple:
+    return tuple(dict.fromkeys([*fields, *KEY_FIELDS]))
+
+@lru_cache(maxsize=128)
+def row_type(fields: tuple):
+    """
+    Immutable row type for a projection. namedtuples carry no per-instance
+    __dict__ (__slots__ = ()), and bypass the ORM identity map entirely.
+    """
+    return namedtuple("IndexRow", fields)
+
+def projection_columns(fields: tuple):
+    return [EntityIndex.__table__.c[f] for f in fields]
+
+def detached(rows) -> list:
+    """
+    Plain result rows for EntityIndex instances, safe to cache and to read
+    after their session has committed or closed. Projected rows pass through.
+    """
+    make = row_type(RESULT_FIELDS)._make
+    return [
+        make(getattr(r, f, None) for f in RESULT_FIELDS) if isinstance(r, EntityIndex) else r
+        for r in rows
+    ]
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+# Monotonic write version of entity_index in this process. Index writers bump
+# it; cached results recorded under an older version are treated as misses.
+_index_version = 0
+_version_lock = Lock()
+
+def bump_index_version() -> int:
+    global _index_version
+    with _version_lock:
+        _index_version += 1
+        return _index_version
+
+def current_index_version() -> int:
+    return _index_version
+
+def criteria_key(kind: str, criteria) -> tuple:
+    """
+    Normalize criteria so equivalent queries (filter/tag order, casing of the
+    sort direction) share one cache entry.
+    """
+    return (
+        kind,
+        criteria.entity_type,
+        tuple(sorted((criteria.filters or {}).items())),
+        tuple(sorted(criteria.tags or [])),
+        criteria.search_text,
+        criteria.semantic_text,
+        criteria.limit,
+        criteria.sort_field,
+        (criteria.sort_dir or "desc").lower(),
+        criteria.assignee,
+        criteria.owner,
+        criteria.cursor,
+        tuple(criteria.facets or ()),
+        tuple(criteria.fields or ()),
+        tuple(criteria.weights or ()),
+        criteria.ann_profile,
+    )
+
+class ResultCache:
+    """
+    Bounded LRU of query results with a TTL. Entries are also dropped when the
+    entity_index version has moved on since they were stored; the TTL bounds
+    staleness for writes made by other processes.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._flushed = (0, 0)
+        self._last_flush = time.monotonic()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, stored_at, value = entry
+                if version == current_index_version() and now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, version: int):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        # Record the version seen before loading so a concurrent write wins
+        version = current_index_version()
+        value = loader()
+        self.put(key, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "version": current_index_version(),
+        }
+
+    def telemetry_due(self, min_interval: float = 60.0) -> bool:
+        """
+        Whether flush_telemetry has something to write and its interval has
+        passed; lets callers skip opening a session for it.
+        """
+        unflushed = (self.hits, self.misses) != self._flushed
+        return unflushed and time.monotonic() - self._last_flush >= min_interval
+
+    def flush_telemetry(self, db, min_interval: float = 60.0, force: bool = False):
+        """
+        Record hit/miss deltas since the last flush as system_telemetry rows
+        (`query_cache_hits`, `query_cache_misses`) for the obs dashboards.
+        """
+        from services.telemetry_repository import TelemetryRepository
+        now = time.monotonic()
+        if not force and now - self._last_flush < min_interval:
+            return
+        hits = self.hits - self._flushed[0]
+        misses = self.misses - self._flushed[1]
+        if not hits and not misses:
+            return
+        timestamp = datetime.utcnow()
+        TelemetryRepository.add(db, 'query_cache_hits', hits, timestamp, {'size': len(self._entries)})
+        TelemetryRepository.add(db, 'query_cache_misses', misses, timestamp, {'size': len(self._entries)})
+        self._flushed = (self.hits, self.misses)
+        self._last_flush = now
+
+result_cache = ResultCache()
@@ -1,45 +1,273 @@
-from sqlalchemy import text
+import os
+from sqlalchemy import select, text, bindparam, cast, func, Integer
+from sqlalchemy.dialects.postgresql import BIT
 from models.entity_index import EntityIndex
-from models.entity_embedding import EntityEmbedding
-from services.query_engine.embedding import generate_embedding
+from models.entity_embedding import EntityEmbedding, Vector, HalfVector
+from services.query_engine.models import QueryCriteria
+from services.query_engine.service import filter_shape, filter_params, build_where
+from services.query_engine.embedding import cached_embedding
+from services.query_engine.embedding_providers import get_provider
+from services.query_engine.embedding_models import require_same_space
+from services.query_engine.plan_cache import plan_cache
+from services.query_engine.result_cache import result_cache, criteria_key
+from services.query_engine.profiler import stage
+from services.query_engine.vector_index import local_index
+from services.query_engine.fusion import build_fusion_statement, DEFAULT_WEIGHTS, RRF_POOL
+from services.query_engine.ann_index import ann_settings, apply_ann_settings, widened
+from services.query_engine.projection import detached
+
+HYBRID_DEFAULT_LIMIT = 100
+MAX_WIDENING = 4          # each step multiplies probes/ef_search (or local k) by 4
+# compact candidate search (migration 023): default candidates fetched per
+# result before the exact re-rank against the full-precision embedding
+RERANK_FACTORS = {
+    "none": 1,
+    "halfvec": 4,
+    "binary": 10,
+}
+
+def vector_distance(dimensions: int):
+    # the same vector(n) cast as the per-space partial ANN index
+    return cast(EntityEmbedding.embedding, Vector(dimensions)).op("<=>")(
+        cast(bindparam("query_embedding", type_=Vector()), Vector(dimensions))
+    )
+
+def compact_distance(quantization: str, dimensions: int):
+    """
+    Distance over the quantized copy, cast like its per-space hnsw index:
+    cosine on halfvec(n), hamming on the binary-quantized bit(n).
+    """
+    query = cast(bindparam("query_embedding", type_=Vector()), Vector(dimensions))
+    if quantization == "halfvec":
+        return cast(EntityEmbedding.embedding_half, HalfVector(dimensions)).op("<=>")(
+            cast(query, HalfVector(dimensions))
+        )
+    return cast(EntityEmbedding.embedding_bits, BIT(dimensions)).op("<~>")(func.binary_quantize(query))
+
+def quantization_settings() -> tuple:
+    """
+    (mode, re-rank factor) from IPE_VECTOR_QUANTIZATION (none, halfvec,
+    binary) and IPE_RERANK_FACTOR.
+    """
+    mode = os.getenv("IPE_VECTOR_QUANTIZATION", "none")
+    if mode not in RERANK_FACTORS:
+        raise ValueError(f"IPE_VECTOR_QUANTIZATION must be one of {', '.join(RERANK_FACTORS)}, got {mode!r}")
+    factor = int(os.getenv("IPE_RERANK_FACTOR") or RERANK_FACTORS[mode])
+    return mode, max(factor, 1)
+
+def same_space():
+    """
+    Only vectors from the query's (model, dimensions) space are candidates.
+    """
+    return [
+        EntityEmbedding.model == bindparam("embed_model"),
+        EntityEmbedding.dimensions == bindparam("embed_dimensions", type_=Integer),
+    ]
+
+def space_params(provider) -> dict:
+    return {"embed_model": provider.model_id, "embed_dimensions": provider.dimensions}
+
+def check_space(db, provider):
+    """
+    Raise when entity_embedding holds vectors but none from the provider's
+    space: an empty result would otherwise hide a model mismatch.
+    """
+    spaces = db.execute(text("SELECT DISTINCT model, dimensions FROM entity_embedding")).all()
+    if spaces and (provider.model_id, provider.dimensions) not in spaces:
+        require_same_space((provider.model_id, provider.dimensions), spaces[0])
+
+def build_vector_statement(shape: tuple, dimensions: int, quantization: str = "none"):
+    """
+    Nearest EntityIndex rows by embedding distance, with the structured
+    filters of `shape` applied in the same statement. With a quantization
+    mode the filtered scan runs over the compact copy for :candidates rows,
+    and only those are re-ranked by the full-precision distance.
+    """
+    distance = vector_distance(dimensions)
+    if quantization == "none":
+        return (
+            select(EntityIndex)
+            .join(EntityEmbedding, EntityEmbedding.entity_id == EntityIndex.entity_id)
+            .where(*same_space(), *build_where(shape))
+            .order_by(distance)
+            .limit(bindparam("limit"))
+        )
+    candidates = (
+        select(EntityEmbedding.id)
+        .join(EntityIndex, EntityEmbedding.entity_id == EntityIndex.entity_id)
+        .where(*same_space(), *build_where(shape))
+        .order_by(compact_distance(quantization, dimensions))
+        .limit(bindparam("candidates"))
+        .subquery("candidates")
+    )
+    return (
+        select(EntityIndex)
+        .join(EntityEmbedding, EntityEmbedding.entity_id == EntityIndex.entity_id)
+        .join(candidates, candidates.c.id == EntityEmbedding.id)
+        .order_by(distance)
+        .limit(bindparam("limit"))
+    )
+
+def hydrate_ordered(db, ids, clauses=(), params=None):
+    """
+    EntityIndex rows for `ids` in one query, in the order given, keeping
+    only rows that also satisfy `clauses`.
+    """
+    if not ids:
+        return []
+    stmt = select(EntityIndex).where(EntityIndex.id.in_(ids), *clauses)
+    rows = {r.id: r for r in db.execute(stmt, params or {}).scalars()}
+    return [rows[i] for i in ids if i in rows]
 
 class SemanticQueryService:
     @staticmethod
-    def semantic_search(db, text_query: str, limit: int = 20):
-        query_embedding = generate_embedding(text_query)
-        sql = text("""
-            SELECT
-                ei.id
-            FROM entity_embedding ee
-            JOIN entity_index ei ON ei.entity_id = ee.entity_id
-            ORDER BY ee.embedding <=> :query_embedding
-            LIMIT :limit
-        """)
-        rows = db.execute(sql, {
+    def semantic_search(db, text_query: str, limit: int = 20, profile=None, entity_type=None, status=None):
+        if profile is not None:
+            return detached(SemanticQueryService._semantic_search(db, text_query, limit, profile, entity_type, status))
+        return result_cache.get_or_load(
+            ("semantic", text_query, limit, entity_type, status),
+            lambda: detached(SemanticQueryService._semantic_search(db, text_query, limit, None, entity_type, status)),
+        )
+
+    @staticmethod
+    def _semantic_search(db, text_query: str, limit: int, profile=None, entity_type=None, status=None):
+        criteria = QueryCriteria(
+            entity_type=entity_type,
+            filters={"status": status} if status else {},
+            semantic_text=text_query,
+            limit=limit,
+        )
+        return SemanticQueryService._vector_search(db, criteria, profile)
+
+    @staticmethod
+    def hybrid_search(db, criteria, profile=None):
+        if profile is not None:
+            return detached(SemanticQueryService._hybrid_search(db, criteria, profile))
+        return result_cache.get_or_load(
+            criteria_key("hybrid", criteria),
+            lambda: detached(SemanticQueryService._hybrid_search(db, criteria)),
+        )
+
+    @staticmethod
+    def _hybrid_search(db, criteria, profile=None):
+        if not criteria.limit:
+            criteria = QueryCriteria(**{**vars(criteria), "limit": HYBRID_DEFAULT_LIMIT})
+        if criteria.search_text:
+            return SemanticQueryService._fused_search(db, criteria, profile)
+        return SemanticQueryService._vector_search(db, criteria, profile)
+
+    @staticmethod
+    def _fused_search(db, criteria, profile=None):
+        """
+        --search with --semantic: full-text and vector rankings fused by
+        reciprocal rank in one statement (always pgvector, never the local
+        index). Rows carry the fused score as `rank`.
+        """
+        provider = get_provider()
+        with stage(profile, "embed"):
+            query_embedding = cached_embedding(db, criteria.semantic_text)
+        shape = filter_shape(criteria)
+        dimensions = provider.dimensions
+        with stage(profile, "plan"):
+            statement = plan_cache.get_or_build(
+                ("fusion", dimensions) + shape,
+                lambda: build_fusion_statement(shape, vector_distance(dimensions), same_space()),
+            )
+        w_text, w_vector = criteria.weights or DEFAULT_WEIGHTS
+        params = {
+            **filter_params(criteria),
+            **space_params(provider),
+            "query_embedding": query_embedding,
+            "w_text": w_text,
+            "w_vector": w_vector,
+            "pool": max(RRF_POOL, criteria.limit),
+            "limit": criteria.limit,
+        }
+        settings = ann_settings(db, criteria.ann_profile, params["pool"], (provider.model_id, dimensions))
+        if profile is not None:
+            profile.record("semantic", statement, params)
+        with stage(profile, "sql"):
+            apply_ann_settings(db, settings)
+            result = db.execute(statement, params).all()
+        with stage(profile, "hydrate") as timing:
+            rows = []
+            for row, rank, snippet in result:
+                row.rank, row.snippet = rank, snippet
+                rows.append(row)
+            timing.rows = len(rows)
+        return rows
+
+    @staticmethod
+    def _vector_search(db, criteria, profile=None):
+        provider = get_provider()
+        with stage(profile, "embed"):
+            query_embedding = cached_embedding(db, criteria.semantic_text)
+        index = local_index(provider.model_id, provider.dimensions)
+        if index is not None:
+            return SemanticQueryService._local_vector_search(db, index, criteria, query_embedding, profile)
+
+        shape = filter_shape(criteria)
+        dimensions = provider.dimensions
+        quantization, rerank = quantization_settings()
+        with stage(profile, "plan"):
+            statement = plan_cache.get_or_build(
+                ("vector", dimensions, quantization) + shape,
+                lambda: build_vector_statement(shape, dimensions, quantization),
+            )
+        params = {
+            **filter_params(criteria),
+            **space_params(provider),
             "query_embedding": query_embedding,
-            "limit": limit,
-        }).fetchall()
-        results = [db.get(EntityIndex, row[0]) for row in rows]
+            "limit": criteria.limit,
+            "candidates": criteria.limit * rerank,
+        }
+        settings = ann_settings(db, criteria.ann_profile, params["candidates"], (provider.model_id, dimensions))
+        if profile is not None:
+            profile.record("semantic", statement, params)
+        with stage(profile, "sql") as timing:
+            apply_ann_settings(db, settings)
+            results = db.execute(statement, params).scalars().all()
+            timing.rows = len(results)
+        if len(results) < criteria.limit:
+            # an ANN scan filters after probing, so a selective filter can
+            # starve it; widen the probe until the page fills or stops growing
+            widening = 0
+            with stage(profile, "widen") as timing:
+                while settings and len(results) < criteria.limit and widening < MAX_WIDENING:
+                    widening += 1
+                    apply_ann_settings(db, widened(settings, 4 ** widening))
+                    wider = db.execute(statement, params).scalars().all()
+                    if len(wider) <= len(results):
+                        break
+                    results = wider
+                timing.rows = len(results)
+            if not results:
+                check_space(db, provider)
         return results
 
     @staticmethod
-    def hybrid_search(db, criteria):
-        # Step 1: Semantic search candidate set (top 100)
-        semantic_results = SemanticQueryService.semantic_search(
-            db,
-            criteria.semantic_text,
-            limit=100
-        )
-        # Step 2: Filter candidates with structured criteria
-        filtered = []
-        for r in semantic_results:
-            if criteria.entity_type and r.entity_type != criteria.entity_type:
-                continue
-            match = True
-            for field, value in (criteria.filters or {}).items():
-                if getattr(r, field) != value:
-                    match = False
-                    break
-            if match:
-                filtered.append(r)
-        return filtered[:criteria.limit]
+    def _local_vector_search(db, index, criteria, query_embedding, profile=None):
+        """
+        Top-k from the in-process index, prefiltered on entity_type/status
+        masks; any other filters are checked by the hydration query, over-
+        fetching k until enough rows survive or the candidates run out.
+        """
+        status = (criteria.filters or {}).get("status")
+        shape = filter_shape(criteria)
+        clauses = build_where(shape)
+        params = filter_params(criteria)
+        residual = bool(set(criteria.filters or {}) - {"status"}) or any(shape[2:])
+        k = criteria.limit * (4 if residual else 1)
+        with stage(profile, "refresh"):
+            index.ensure_fresh(db)
+        for _ in range(MAX_WIDENING + 1):
+            with stage(profile, "local_index") as timing:
+                hits = index.search(query_embedding, k, entity_type=criteria.entity_type, status=status)
+                timing.rows = len(hits)
+            with stage(profile, "hydrate") as timing:
+                results = hydrate_ordered(db, [i for i, _ in hits], clauses, params)
+                timing.rows = len(results)
+            if len(results) >= criteria.limit or len(hits) < k:
+                break
+            k *= 4
+        return results[:criteria.limit]
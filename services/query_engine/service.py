@@ -1,45 +1,355 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, text
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, text, tuple_, bindparam, func, literal_column, union_all, exists, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.types import TIMESTAMP
 from models.entity_index import EntityIndex
 from services.query_engine.models import QueryCriteria
+from services.query_engine.pagination import decode_cursor
+from services.query_engine.plan_cache import plan_cache
+from services.query_engine.result_cache import result_cache, criteria_key
+from services.query_engine.facets import build_facet_statement, rows_to_facets
+from services.query_engine.estimates import estimated_count
+from services.query_engine.profiler import stage
+from services.query_engine.projection import detached, projected_fields, projection_columns, row_type
+
+STREAM_CHUNK_SIZE = 500
+HEADLINE_OPTIONS = "StartSel=[, StopSel=], MaxFragments=2, MaxWords=20, MinWords=5"
+
+def _filter_fields(criteria: QueryCriteria):
+    # Unknown fields are ignored, so they never reach the shape or the params
+    return tuple(sorted(f for f in (criteria.filters or {}) if hasattr(EntityIndex, f)))
+
+def _keyset_sort(criteria: QueryCriteria) -> bool:
+    return not criteria.sort_field or criteria.sort_field == "updated_at"
+
+def _ranked(criteria: QueryCriteria) -> bool:
+    # Full-text queries order by relevance unless paging by cursor or sorted explicitly
+    return bool(criteria.search_text) and not criteria.cursor and criteria.sort_field in (None, "rank")
+
+def keyset_paged(criteria: QueryCriteria) -> bool:
+    """
+    Whether results are ordered by (updated_at, id) and can hand out a cursor.
+    """
+    return _keyset_sort(criteria) and not _ranked(criteria)
+
+def _ts_query(prefix: str = ""):
+    return text(f"plainto_tsquery('simple', :{prefix}search)")
+
+def filter_shape(criteria: QueryCriteria) -> tuple:
+    """
+    The value-free structure of the WHERE clause alone.
+    """
+    return (
+        bool(criteria.entity_type),
+        _filter_fields(criteria),
+        bool(criteria.tags),
+        bool(criteria.assignee),
+        bool(criteria.owner),
+        bool(criteria.search_text),
+    )
+
+def criteria_shape(criteria: QueryCriteria) -> tuple:
+    """
+    The value-free structure of a query: two criteria with the same shape
+    compile to the same SQL and differ only in bound parameters.
+    """
+    if criteria.cursor and not _keyset_sort(criteria):
+        raise ValueError("--cursor pagination requires sorting by updated_at")
+    if _ranked(criteria):
+        sort_field = "rank"
+    elif _keyset_sort(criteria) or not hasattr(EntityIndex, criteria.sort_field):
+        sort_field = None
+    else:
+        sort_field = criteria.sort_field
+    return filter_shape(criteria) + (
+        sort_field,
+        "asc" if criteria.sort_dir == "asc" else "desc",
+        bool(criteria.cursor),
+        criteria.limit is not None,
+        projected_fields(criteria.fields) if criteria.fields else None,
+    )
+
+def criteria_params(criteria: QueryCriteria, prefix: str = "") -> dict:
+    params = {}
+    if criteria.entity_type:
+        params["entity_type"] = criteria.entity_type
+    for field in _filter_fields(criteria):
+        params[f"f_{field}"] = criteria.filters[field]
+    if criteria.tags:
+        params["tags"] = list(criteria.tags)
+    if criteria.assignee:
+        params["assignee"] = criteria.assignee
+    if criteria.owner:
+        params["owner"] = criteria.owner
+    if criteria.search_text:
+        params["search"] = criteria.search_text
+    if criteria.cursor:
+        params["cursor_ts"], params["cursor_id"] = decode_cursor(criteria.cursor)
+    if criteria.limit is not None:
+        params["limit"] = criteria.limit
+    return {f"{prefix}{key}": value for key, value in params.items()}
+
+def filter_params(criteria: QueryCriteria) -> dict:
+    """
+    Parameters for the WHERE clause alone (no cursor or limit).
+    """
+    params = criteria_params(criteria)
+    for key in ("cursor_ts", "cursor_id", "limit"):
+        params.pop(key, None)
+    return params
+
+def build_where(shape: tuple, prefix: str = "") -> list:
+    has_type, filter_fields, has_tags, has_assignee, has_owner, has_search = shape[:6]
+    clauses = []
+    # Entity type filtering
+    if has_type:
+        clauses.append(EntityIndex.entity_type == bindparam(f"{prefix}entity_type"))
+    # Field filters
+    for field in filter_fields:
+        clauses.append(getattr(EntityIndex, field) == bindparam(f"{prefix}f_{field}"))
+    # Tag filtering: containment is a single bound array and can use the GIN index
+    if has_tags:
+        clauses.append(EntityIndex.tags.op("@>")(bindparam(f"{prefix}tags", type_=ARRAY(Text))))
+    # Dedicated fields
+    if has_assignee:
+        clauses.append(EntityIndex.assignee == bindparam(f"{prefix}assignee"))
+    if has_owner:
+        clauses.append(EntityIndex.owner == bindparam(f"{prefix}owner"))
+    # Full-text search
+    if has_search:
+        clauses.append(EntityIndex.search_vector.op('@@')(_ts_query(prefix)))
+    return clauses
+
+def _rank(prefix: str = ""):
+    return func.ts_rank_cd(EntityIndex.search_vector, _ts_query(prefix))
+
+def build_order(shape: tuple, prefix: str = ""):
+    """
+    Return (keyset_clauses, order_by) for the sort part of a shape.
+    """
+    sort_field, sort_dir, has_cursor = shape[6:9]
+    if sort_field == "rank":
+        return [], [_rank(prefix).desc(), EntityIndex.updated_at.desc(), EntityIndex.id.desc()]
+    if sort_field:
+        sort_col = getattr(EntityIndex, sort_field)
+        return [], [sort_col.asc() if sort_dir == "asc" else sort_col.desc()]
+    # Keyset ordering: (updated_at, id) is unique, so pages never overlap
+    keyset_clauses = []
+    if has_cursor:
+        keyset = tuple_(EntityIndex.updated_at, EntityIndex.id)
+        after = tuple_(
+            bindparam(f"{prefix}cursor_ts", type_=TIMESTAMP(timezone=True)),
+            bindparam(f"{prefix}cursor_id", type_=UUID(as_uuid=True)),
+        )
+        keyset_clauses.append(keyset > after if sort_dir == "asc" else keyset < after)
+    if sort_dir == "asc":
+        return keyset_clauses, [EntityIndex.updated_at.asc(), EntityIndex.id.asc()]
+    return keyset_clauses, [EntityIndex.updated_at.desc(), EntityIndex.id.desc()]
+
+def build_statement(shape: tuple):
+    has_search = shape[5]
+    has_limit, fields = shape[9:11]
+    if fields:
+        # Plain columns: rows come back as tuples without ORM hydration
+        query = select(*projection_columns(fields))
+    elif has_search:
+        # Relevance over the weighted vector, plus a highlighted snippet that
+        # Postgres only computes for the rows that survive the LIMIT
+        snippet = func.ts_headline(
+            literal_column("'simple'"),
+            func.concat_ws(" ", EntityIndex.title, EntityIndex.summary),
+            _ts_query(),
+            HEADLINE_OPTIONS,
+        )
+        query = select(EntityIndex, _rank().label("rank"), snippet.label("snippet"))
+    else:
+        query = select(EntityIndex)
+    keyset_clauses, order_by = build_order(shape)
+    query = query.where(*build_where(shape), *keyset_clauses).order_by(*order_by)
+    # Limit
+    if has_limit:
+        query = query.limit(bindparam("limit", type_=Integer))
+    return query
+
+def build_batch_statement(shapes: tuple):
+    """
+    UNION ALL of one member per shape. Binds in member i are prefixed `q{i}_`;
+    each row carries its member index and its position within that member.
+    """
+    members = []
+    for i, shape in enumerate(shapes):
+        prefix = f"q{i}_"
+        keyset_clauses, order_by = build_order(shape, prefix)
+        member = (
+            select(
+                *EntityIndex.__table__.c,
+                literal_column(str(i), Integer).label("query_index"),
+                func.row_number().over(order_by=order_by).label("position"),
+            )
+            .where(*build_where(shape, prefix), *keyset_clauses)
+            .order_by(*order_by)
+        )
+        if shape[9]:
+            member = member.limit(bindparam(f"{prefix}limit", type_=Integer))
+        members.append(member.subquery().select())
+    batch = union_all(*members).subquery("batch")
+    row = aliased(EntityIndex, batch)
+    return (
+        select(row, batch.c.query_index)
+        .order_by(batch.c.query_index, batch.c.position)
+    )
 
 class QueryService:
     @staticmethod
-    def search(db: Session, criteria: QueryCriteria):
-        query = select(EntityIndex)
-        # Entity type filtering
-        if criteria.entity_type:
-            query = query.where(EntityIndex.entity_type == criteria.entity_type)
-        # Field filters
-        for field, value in (criteria.filters or {}).items():
-            col = getattr(EntityIndex, field, None)
-            if col is not None:
-                query = query.where(col == value)
-        # Tag filtering
-        if criteria.tags:
-            for tag in criteria.tags:
-                query = query.where(text(f"'{tag}' = ANY(tags)"))
-        # Dedicated fields
-        if criteria.assignee:
-            query = query.where(EntityIndex.assignee == criteria.assignee)
-        if criteria.owner:
-            query = query.where(EntityIndex.owner == criteria.owner)
-        # Full-text search
-        if criteria.search_text:
-            ts_query = text(f"plainto_tsquery('simple', :search)")
-            query = query.where(EntityIndex.search_vector.op('@@')(ts_query))
-            query = query.params(search=criteria.search_text)
-        # Sorting
-        if criteria.sort_field:
-            sort_col = getattr(EntityIndex, criteria.sort_field, None)
-            if sort_col is not None:
-                if criteria.sort_dir == "asc":
-                    query = query.order_by(sort_col.asc())
+    def plan(criteria: QueryCriteria):
+        """
+        Return (statement, params) for the criteria, reusing a cached
+        statement for its shape.
+        """
+        shape = criteria_shape(criteria)
+        statement = plan_cache.get_or_build(shape, lambda: build_statement(shape))
+        return statement, criteria_params(criteria)
+
+    @staticmethod
+    def search(db: Session, criteria: QueryCriteria, use_cache: bool = True, profile=None):
+        with stage(profile, "plan"):
+            statement, params = QueryService.plan(criteria)
+        def load():
+            with stage(profile, "sql"):
+                result = db.execute(statement, params)
+            with stage(profile, "hydrate") as timing:
+                if criteria.fields:
+                    make = row_type(projected_fields(criteria.fields))._make
+                    rows = [make(row) for row in result]
+                elif criteria.search_text:
+                    rows = []
+                    for row, rank, snippet in result.all():
+                        row.rank, row.snippet = rank, snippet
+                        rows.append(row)
                 else:
-                    query = query.order_by(sort_col.desc())
-        else:
-            query = query.order_by(EntityIndex.updated_at.desc())
-        # Limit
-        query = query.limit(criteria.limit)
-        results = db.execute(query).scalars().all()
-        return results
+                    rows = result.scalars().all()
+                rows = detached(rows)
+                timing.rows = len(rows)
+            return rows
+        if profile is not None:
+            profile.record("search", statement, params)
+        if not use_cache or profile is not None:
+            return load()
+        return result_cache.get_or_load(criteria_key("search", criteria), load)
+
+    @staticmethod
+    def search_many(db: Session, criteria_list: list[QueryCriteria], profile=None):
+        """
+        Run a batch of criteria in one round trip; returns one result list
+        per criteria, in the same order.
+        """
+        if not criteria_list:
+            return []
+        with stage(profile, "plan"):
+            shapes = tuple(criteria_shape(c) for c in criteria_list)
+            statement = plan_cache.get_or_build(
+                ("batch", shapes), lambda: build_batch_statement(shapes)
+            )
+            params = {}
+            for i, criteria in enumerate(criteria_list):
+                params.update(criteria_params(criteria, prefix=f"q{i}_"))
+        if profile is not None:
+            profile.record("search_many", statement, params)
+        with stage(profile, "sql"):
+            result = db.execute(statement, params)
+        grouped = [[] for _ in criteria_list]
+        with stage(profile, "hydrate") as timing:
+            rows = result.all()
+            for row, query_index in rows:
+                grouped[query_index].append(row)
+            for i, criteria in enumerate(criteria_list):
+                # the same rows search() returns: its projection, or plain rows
+                if criteria.fields:
+                    fields = projected_fields(criteria.fields)
+                    make = row_type(fields)._make
+                    grouped[i] = [make(getattr(r, f) for f in fields) for r in grouped[i]]
+                else:
+                    grouped[i] = detached(grouped[i])
+            timing.rows = len(rows)
+        return grouped
+
+    @staticmethod
+    def stream(db: Session, criteria: QueryCriteria, chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Yield matching rows through a server-side cursor, `chunk_size` at a time.
+        """
+        statement, params = QueryService.plan(criteria)
+        statement = statement.execution_options(stream_results=True, yield_per=chunk_size)
+        if criteria.fields:
+            make = row_type(projected_fields(criteria.fields))._make
+            for row in db.execute(statement, params):
+                yield make(row)
+            return
+        for row in db.execute(statement, params).scalars():
+            yield row
+            # Rows are read-only; drop them from the identity map to keep memory flat
+            db.expunge(row)
+
+    @staticmethod
+    def facets(db: Session, criteria: QueryCriteria, use_cache: bool = True, profile=None):
+        """
+        Count criteria.facets over every row matching the criteria filters in
+        a single round trip; sorting, cursor and limit do not apply.
+        """
+        facets = tuple(criteria.facets or ())
+        shape = ("facets", filter_shape(criteria), facets)
+        with stage(profile, "plan"):
+            statement = plan_cache.get_or_build(
+                shape, lambda: build_facet_statement(build_where(shape[1]), facets)
+            )
+            params = filter_params(criteria)
+        def load():
+            with stage(profile, "sql") as timing:
+                rows = db.execute(statement, params).fetchall()
+                timing.rows = len(rows)
+            return rows_to_facets(rows, facets)
+        if profile is not None:
+            profile.record("facets", statement, params)
+        if not use_cache or profile is not None:
+            return load()
+        return result_cache.get_or_load(criteria_key("facets", criteria), load)
+
+    @staticmethod
+    def count(db: Session, criteria: QueryCriteria, estimate: bool = False,
+              use_cache: bool = True, profile=None) -> int:
+        """
+        SELECT count(*) over the criteria filters. With estimate=True and no
+        filter beyond entity_type, answer from planner statistics instead.
+        """
+        shape = ("count", filter_shape(criteria))
+        if estimate and not any(shape[1][1:]):
+            approx = estimated_count(db, criteria.entity_type)
+            if approx is not None:
+                return approx
+        with stage(profile, "plan"):
+            statement = plan_cache.get_or_build(
+                shape, lambda: select(func.count()).select_from(EntityIndex).where(*build_where(shape[1]))
+            )
+            params = filter_params(criteria)
+        def load():
+            with stage(profile, "sql"):
+                return db.execute(statement, params).scalar_one()
+        if profile is not None:
+            profile.record("count", statement, params)
+        if not use_cache or profile is not None:
+            return load()
+        return result_cache.get_or_load(criteria_key("count", criteria), load)
+
+    @staticmethod
+    def exists(db: Session, criteria: QueryCriteria) -> bool:
+        """
+        Whether any row matches; the server stops at the first match.
+        """
+        shape = ("exists", filter_shape(criteria))
+        statement = plan_cache.get_or_build(
+            shape, lambda: select(exists().where(*build_where(shape[1])))
+        )
+        return result_cache.get_or_load(
+            criteria_key("exists", criteria),
+            lambda: db.execute(statement, filter_params(criteria)).scalar_one(),
+        )
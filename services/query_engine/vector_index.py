@@ -0,0 +1,286 @@
+import json
+import os
+import time
+import uuid
+from threading import Lock
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import text
+from services.query_engine.embedding_models import space_key, require_same_space
+
+DTYPES = ("float16", "int8")
+SCAN_CHUNK = 1024
+INITIAL_CAPACITY = 1024
+
+# Stream of (entity_index id, entity_id, type, status, vector) newer than the
+# watermark. Status lives on entity_index, so either side changing counts.
+CHANGED_ROWS = text("""
+    SELECT ei.id, ee.entity_id, ei.entity_type, ei.status, ee.embedding::text,
+           GREATEST(ee.updated_at, ei.updated_at) AS changed_at
+    FROM entity_embedding ee
+    JOIN entity_index ei ON ei.entity_id = ee.entity_id
+    WHERE ee.model = :model AND ee.dimensions = :dimensions
+      AND GREATEST(ee.updated_at, ei.updated_at) > :since
+""")
+LIVE_ENTITY_IDS = text("SELECT entity_id FROM entity_embedding WHERE model = :model AND dimensions = :dimensions")
+LIVE_COUNT = text("SELECT count(*) FROM entity_embedding WHERE model = :model AND dimensions = :dimensions")
+
+def default_path() -> str:
+    return os.getenv("IPE_VECTOR_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".ipe", "vector_index"))
+
+def parse_vector(literal: str) -> np.ndarray:
+    return np.array(literal[1:-1].split(","), dtype=np.float32)
+
+class LocalVectorIndex:
+    """
+    Exact top-k over a memory-mapped copy of one (model, dimensions) space
+    of entity_embedding.
+
+    Vectors are L2-normalised and stored as float16, or as int8 with a
+    per-row scale, next to parallel arrays of entity_index ids, entity ids,
+    liveness and entity_type/status codes. Search scores are dot products
+    (cosine similarity) computed a chunk at a time, so resident memory stays
+    bounded while the OS page cache keeps the matrix hot between queries.
+    refresh() pulls only rows changed since the last watermark.
+    """
+
+    def __init__(self, model: str, dimensions: int, path: str = None, dtype: str = "float16",
+                 refresh_interval: float = 30.0):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector index dtype '{dtype}'. Allowed: {', '.join(DTYPES)}")
+        self.model = model
+        self.dimensions = dimensions
+        self.path = os.path.join(path or default_path(), space_key(model, dimensions), dtype)
+        self.dtype = dtype
+        self.refresh_interval = refresh_interval
+        self._lock = Lock()
+        self._checked_at = 0.0
+        self._load()
+
+    # -- storage -------------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.meta = meta
+            if meta["dimensions"]:
+                self.vectors = open_memmap(self._file("vectors"), mode="r+")
+                self.scales = open_memmap(self._file("scales"), mode="r+")
+                self.ids = open_memmap(self._file("ids"), mode="r+")
+                self.entity_ids = open_memmap(self._file("entity_ids"), mode="r+")
+                self.alive = open_memmap(self._file("alive"), mode="r+")
+                self.types = open_memmap(self._file("types"), mode="r+")
+                self.statuses = open_memmap(self._file("statuses"), mode="r+")
+                self._positions = {self.entity_ids[i].tobytes(): i for i in range(self.meta["count"])}
+                return
+        self.meta = {"dtype": self.dtype, "dimensions": None, "count": 0, "watermark": None,
+                     "vocab": {"types": {}, "statuses": {}}}
+        self.vectors = None
+        self._positions = {}
+
+    def _allocate(self, capacity, dimensions):
+        os.makedirs(self.path, exist_ok=True)
+        old = None if self.vectors is None else (
+            self.vectors, self.scales, self.ids, self.entity_ids, self.alive, self.types, self.statuses
+        )
+        shapes = [
+            ("vectors", (capacity, dimensions), np.float16 if self.dtype == "float16" else np.int8),
+            ("scales", (capacity,), np.float32),
+            ("ids", (capacity, 16), np.uint8),
+            ("entity_ids", (capacity, 16), np.uint8),
+            ("alive", (capacity,), np.bool_),
+            ("types", (capacity,), np.int16),
+            ("statuses", (capacity,), np.int16),
+        ]
+        arrays = []
+        for i, (name, shape, dtype) in enumerate(shapes):
+            tmp = self._file(name) + ".tmp"
+            arr = open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            if old is not None:
+                n = min(self.meta["count"], len(old[i]))
+                arr[:n] = old[i][:n]
+            arr.flush()
+            del arr
+            os.replace(tmp, self._file(name))
+            arrays.append(open_memmap(self._file(name), mode="r+"))
+        (self.vectors, self.scales, self.ids, self.entity_ids,
+         self.alive, self.types, self.statuses) = arrays
+        self.meta["dimensions"] = dimensions
+
+    def _save_meta(self):
+        for arr in (self.vectors, self.scales, self.ids, self.entity_ids, self.alive, self.types, self.statuses):
+            arr.flush()
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def _code(self, vocab, value):
+        if value is None:
+            return 0
+        codes = self.meta["vocab"][vocab]
+        if value not in codes:
+            codes[value] = len(codes) + 1
+        return codes[value]
+
+    # -- writes --------------------------------------------------------------
+
+    def _encode(self, matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), np.ones(len(matrix), dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def upsert(self, ids, entity_ids, entity_types, statuses, matrix):
+        """
+        Insert or overwrite rows keyed by entity_id. `ids`/`entity_ids` are
+        UUIDs; `matrix` is (n, dimensions) float32.
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if self.vectors is None:
+            self._allocate(max(INITIAL_CAPACITY, len(matrix)), matrix.shape[1])
+        require_same_space((self.model, matrix.shape[1]), (self.model, self.dimensions))
+        codes, scales = self._encode(matrix)
+        rows = []
+        for entity_id in entity_ids:
+            key = entity_id.bytes
+            row = self._positions.get(key)
+            if row is None:
+                row = self._positions[key] = self.meta["count"]
+                self.meta["count"] += 1
+            rows.append(row)
+        if self.meta["count"] > len(self.vectors):
+            self._allocate(max(self.meta["count"], 2 * len(self.vectors)), self.meta["dimensions"])
+        rows = np.array(rows, dtype=np.int64)
+        self.vectors[rows] = codes
+        self.scales[rows] = scales
+        self.ids[rows] = np.frombuffer(b"".join(i.bytes for i in ids), dtype=np.uint8).reshape(-1, 16)
+        self.entity_ids[rows] = np.frombuffer(b"".join(e.bytes for e in entity_ids), dtype=np.uint8).reshape(-1, 16)
+        self.alive[rows] = True
+        self.types[rows] = [self._code("types", t) for t in entity_types]
+        self.statuses[rows] = [self._code("statuses", s) for s in statuses]
+
+    def refresh(self, db, batch: int = 5000) -> int:
+        """
+        Pull rows changed since the watermark, then tombstone entities whose
+        embedding was deleted. Returns the number of rows written.
+        """
+        with self._lock:
+            space = {"model": self.model, "dimensions": self.dimensions}
+            since = self.meta["watermark"] or "-infinity"
+            result = db.execute(CHANGED_ROWS.execution_options(stream_results=True), {**space, "since": since})
+            written = 0
+            watermark = None
+            while True:
+                chunk = result.fetchmany(batch)
+                if not chunk:
+                    break
+                self.upsert(
+                    [r[0] if isinstance(r[0], uuid.UUID) else uuid.UUID(str(r[0])) for r in chunk],
+                    [r[1] if isinstance(r[1], uuid.UUID) else uuid.UUID(str(r[1])) for r in chunk],
+                    [r[2] for r in chunk],
+                    [r[3] for r in chunk],
+                    np.stack([parse_vector(r[4]) for r in chunk]),
+                )
+                written += len(chunk)
+                latest = max(r[5] for r in chunk)
+                watermark = latest if watermark is None else max(watermark, latest)
+            if watermark is not None:
+                self.meta["watermark"] = watermark.isoformat()
+            if self.vectors is not None:
+                live = db.execute(LIVE_COUNT, space).scalar()
+                if live != int(self.alive[:self.meta["count"]].sum()):
+                    keep = {
+                        (e if isinstance(e, uuid.UUID) else uuid.UUID(str(e))).bytes
+                        for (e,) in db.execute(LIVE_ENTITY_IDS, space)
+                    }
+                    for key, row in self._positions.items():
+                        if key not in keep:
+                            self.alive[row] = False
+                self._save_meta()
+            self._checked_at = time.monotonic()
+            return written
+
+    def ensure_fresh(self, db):
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            self.refresh(db)
+
+    # -- reads ---------------------------------------------------------------
+
+    def mask(self, entity_type=None, status=None):
+        n = self.meta["count"]
+        mask = np.array(self.alive[:n])
+        for vocab, codes, value in (("types", self.types, entity_type), ("statuses", self.statuses, status)):
+            if value is None:
+                continue
+            code = self.meta["vocab"][vocab].get(value)
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            mask &= codes[:n] == code
+        return mask
+
+    def search(self, query, k: int = 20, entity_type=None, status=None):
+        """
+        [(entity_index id, similarity)] for the k nearest live rows,
+        best first, restricted to entity_type/status when given.
+        """
+        if self.vectors is None or not self.meta["count"]:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        require_same_space((self.model, q.shape[0]), (self.model, self.dimensions))
+        q = q / (np.linalg.norm(q) or 1.0)
+        mask = self.mask(entity_type, status)
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        # a selective filter gathers only its rows; otherwise scan contiguous
+        # chunks and drop masked rows afterwards
+        dense = len(candidates) > len(mask) // 4
+        rows = np.arange(len(mask)) if dense else candidates
+        vectors = self.vectors[:len(mask)]
+        scales = self.scales[:len(mask)]
+        scores = np.empty(len(rows), dtype=np.float32)
+        # widen one cache-sized block at a time into a reused buffer
+        buffer = np.empty((SCAN_CHUNK, q.shape[0]), dtype=np.float32)
+        for start in range(0, len(rows), SCAN_CHUNK):
+            if dense:
+                block = vectors[start:start + SCAN_CHUNK]
+                scale = scales[start:start + SCAN_CHUNK]
+            else:
+                picked = rows[start:start + SCAN_CHUNK]
+                block = vectors[picked]
+                scale = scales[picked]
+            wide = buffer[:len(block)]
+            np.copyto(wide, block, casting="unsafe")
+            scores[start:start + len(block)] = (wide @ q) * scale
+        if dense:
+            scores[~mask] = -np.inf
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(uuid.UUID(bytes=self.ids[rows[i]].tobytes()), float(scores[i])) for i in top]
+
+_index = None
+_index_lock = Lock()
+
+def local_index(model: str, dimensions: int):
+    """
+    The process-wide index for this space when IPE_VECTOR_INDEX is float16
+    or int8, else None (semantic search then stays in pgvector).
+    """
+    global _index
+    dtype = os.getenv("IPE_VECTOR_INDEX", "off")
+    if dtype == "off":
+        return None
+    with _index_lock:
+        if _index is None or (_index.model, _index.dimensions) != (model, dimensions):
+            _index = LocalVectorIndex(model, dimensions, dtype=dtype)
+        return _index
@@ -1,5 +1,7 @@
 import click
 from services.telemetry_repository import TelemetryRepository
+from services.query_engine.models import QueryCriteria
+from services.query_engine.service import QueryService
 from src.core.config import get_db
 from datetime import datetime, timedelta
 
@@ -78,3 +80,46 @@ def drift():
     click.echo("=== Drift Detection ===")
     for m in metrics:
         click.echo(f"{m.timestamp:%H:%M}   {m.value}")
+
+@obs.command()
+def cache():
+    """Show query result cache effectiveness"""
+    db = get_db()
+    start, end = datetime.utcnow() - timedelta(days=1), datetime.utcnow()
+    hits = TelemetryRepository.get_metrics(db, 'query_cache_hits', start, end)
+    misses = TelemetryRepository.get_metrics(db, 'query_cache_misses', start, end)
+    total_hits = sum(m.value for m in hits)
+    total_misses = sum(m.value for m in misses)
+    lookups = total_hits + total_misses
+    click.echo("=== Query Result Cache ===")
+    click.echo(f"Hits:              {total_hits}")
+    click.echo(f"Misses:            {total_misses}")
+    click.echo(f"Hit ratio:         {total_hits / lookups:.1%}" if lookups else "Hit ratio:         -")
+    for m in hits:
+        click.echo(f"{m.timestamp:%H:%M}   {m.value}")
+
+@obs.command()
+def embeddings():
+    """Show re-embedding backlog and worker throughput"""
+    db = get_db()
+    start, end = datetime.utcnow() - timedelta(days=1), datetime.utcnow()
+    backlog = TelemetryRepository.get_latest(db, 'embedding_backlog')
+    throughput = TelemetryRepository.get_metrics(db, 'embedding_throughput', start, end)
+    click.echo("=== Embedding Worker ===")
+    if backlog:
+        click.echo(f"Backlog:           {backlog.value} stale ({backlog.meta.get('space')}, {backlog.timestamp:%H:%M})")
+    else:
+        click.echo("Backlog:           -")
+    for m in throughput:
+        click.echo(f"{m.timestamp:%H:%M}   {m.value} entities/min")
+
+@obs.command()
+def index():
+    """Show entity index size without loading rows"""
+    db = get_db()
+    total = QueryService.count(db, QueryCriteria(), estimate=True)
+    by_type = QueryService.facets(db, QueryCriteria(facets=["entity_type"]))
+    click.echo("=== Entity Index ===")
+    click.echo(f"Rows (estimated):  {total}")
+    for entity_type, n in by_type["entity_type"]:
+        click.echo(f"  {entity_type:<16} {n}")
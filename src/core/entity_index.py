@@ -1,6 +1,13 @@
+import atexit
+import heapq
+import itertools
+import mmap
+import os
+import struct
 import uuid
-from datetime import datetime
-from typing import List
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict
 
 class EntityIndex:
     def __init__(self, entity_id, entity_type, canonical_id, title, summary, tags, status, priority, assignee, owner, due_date, updated_at, search_vector):
@@ -22,41 +29,349 @@ class EntityIndex:
     def to_dict(self):
         return self.__dict__
 
+# fields with a value -> entity_ids hash index
+INDEXED_FIELDS = ("entity_type", "status", "priority", "assignee")
+# candidate sets larger than 1/SCAN_RATIO of the index are walked in record
+# order instead of being sorted, so an unsorted page stops at `limit`
+SCAN_RATIO = 8
+
+def trigrams(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class InMemoryEntityIndex:
+    """
+    Records keyed by entity_id, with hash indexes on INDEXED_FIELDS, an
+    inverted tag index, and an inverted index over search_vector tokens
+    whose vocabulary is itself trigram-indexed so substring searches find
+    their tokens without a vocabulary scan. Updates cost O(fields + tags +
+    tokens); queries intersect candidate id sets and only check what no
+    index covers. Results match the former list scan, order included.
+    """
+
+    def __init__(self):
+        self.records: Dict[object, EntityIndex] = {}
+        self.fields = {f: {} for f in INDEXED_FIELDS}
+        self.tags = {}
+        self.tokens = {}
+        self.trigrams = {}
+        # insertion order of the old list: an updated record moves to the end
+        self._seq = {}
+        self._counter = itertools.count()
+        # tokens/trigrams are built on the first text search after load()
+        self._text_indexed = True
+
+    def __len__(self):
+        return len(self.records)
+
+    @staticmethod
+    def _add(index, key, entity_id) -> bool:
+        ids = index.get(key)
+        if ids is None:
+            index[key] = {entity_id}
+            return True
+        ids.add(entity_id)
+        return False
+
+    @staticmethod
+    def _discard(index, key, entity_id) -> bool:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(entity_id)
+            if not ids:
+                del index[key]
+                return True
+        return False
+
+    def remove(self, entity_id):
+        record = self.records.pop(entity_id, None)
+        if record is None:
+            return None
+        del self._seq[entity_id]
+        for f in INDEXED_FIELDS:
+            self._discard(self.fields[f], getattr(record, f), entity_id)
+        for tag in set(record.tags or ()):
+            self._discard(self.tags, tag, entity_id)
+        if not self._text_indexed:
+            return record
+        for token in set((record.search_vector or "").split()):
+            if self._discard(self.tokens, token, entity_id):
+                for gram in trigrams(token):
+                    self._discard(self.trigrams, gram, token)
+        return record
+
+    def put(self, record: EntityIndex):
+        entity_id = record.entity_id
+        self.remove(entity_id)
+        self.records[entity_id] = record
+        self._seq[entity_id] = next(self._counter)
+        for f in INDEXED_FIELDS:
+            self._add(self.fields[f], getattr(record, f), entity_id)
+        for tag in set(record.tags or ()):
+            self._add(self.tags, tag, entity_id)
+        if not self._text_indexed:
+            return
+        for token in set((record.search_vector or "").split()):
+            if self._add(self.tokens, token, entity_id):
+                for gram in trigrams(token):
+                    self._add(self.trigrams, gram, token)
+
+    def clear(self):
+        self.__init__()
+
+    def load(self, records):
+        """
+        put() for many records into an empty index. The field and tag
+        indexes are built in one pass; the text index, the bulk of the
+        work, waits for the first query that needs it.
+        """
+        assert not self.records, "load() fills an empty index"
+        self._text_indexed = False
+        fields = [(f, self.fields[f]) for f in INDEXED_FIELDS]
+        for record in records:
+            entity_id = record.entity_id
+            if entity_id in self.records:
+                self.put(record)
+                continue
+            self.records[entity_id] = record
+            self._seq[entity_id] = next(self._counter)
+            for f, index in fields:
+                index.setdefault(getattr(record, f), set()).add(entity_id)
+            for tag in record.tags or ():
+                self.tags.setdefault(tag, set()).add(entity_id)
+
+    def _index_text(self):
+        tokens = self.tokens
+        for entity_id, record in self.records.items():
+            for token in (record.search_vector or "").split():
+                tokens.setdefault(token, set()).add(entity_id)
+        for token in tokens:
+            for gram in trigrams(token):
+                self.trigrams.setdefault(gram, set()).add(token)
+        self._text_indexed = True
+
+    def _tokens_containing(self, piece: str):
+        """
+        Vocabulary tokens that contain `piece`, or None when the piece is
+        too short to look up by trigram.
+        """
+        grams = sorted((self.trigrams.get(g, ()) for g in trigrams(piece)), key=len)
+        if not grams:
+            return None
+        return [t for t in set(grams[0]).intersection(*grams[1:]) if piece in t]
+
+    def _text_candidates(self, needle: str):
+        """
+        Ids whose search_vector may contain `needle`: each whitespace-free
+        piece of it lies inside a single token. None when no piece narrows
+        the search. Callers still check the full substring.
+        """
+        result = None
+        for piece in sorted(set(needle.split()), key=len, reverse=True):
+            matching = self._tokens_containing(piece)
+            if matching is None:
+                continue
+            if len(matching) == 1:
+                ids = self.tokens[matching[0]]
+            else:
+                ids = set().union(*(self.tokens[t] for t in matching))
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def _in_order(self, ids, limit):
+        if limit is not None and len(ids) * SCAN_RATIO > len(self.records):
+            return (r for r in self.records.values() if r.entity_id in ids)
+        return (self.records[i] for i in sorted(ids, key=self._seq.__getitem__))
+
+    def query(self, entity_type=None, filters=None, tags=None, search_text=None, limit=50, sort_field=None, sort_dir="desc"):
+        candidates = []
+        residual = {}
+        if entity_type:
+            candidates.append(self.fields["entity_type"].get(entity_type, set()))
+        for k, v in (filters or {}).items():
+            if k in self.fields:
+                candidates.append(self.fields[k].get(v, set()))
+            else:
+                residual[k] = v
+        for tag in set(tags or ()):
+            candidates.append(self.tags.get(tag, set()))
+        needle = search_text.lower() if search_text else None
+        if needle:
+            if not self._text_indexed:
+                self._index_text()
+            ids = self._text_candidates(needle)
+            if ids is not None:
+                candidates.append(ids)
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = candidates[0].intersection(*candidates[1:]) if len(candidates) > 1 else candidates[0]
+            rows = (self.records[i] for i in ids) if sort_field else self._in_order(ids, limit)
+        else:
+            rows = iter(self.records.values())
+        if residual:
+            rows = (r for r in rows if all(getattr(r, k, None) == v for k, v in residual.items()))
+        if needle:
+            rows = (r for r in rows if needle in r.search_vector)
+
+        if not sort_field:
+            return list(itertools.islice(rows, limit))
+        # ties keep insertion order, as the stable sort over the list did
+        seq = self._seq
+        if sort_dir == "desc":
+            key = lambda r: (getattr(r, sort_field, None), -seq[r.entity_id])
+            return sorted(rows, key=key, reverse=True) if limit is None else heapq.nlargest(limit, rows, key=key)
+        key = lambda r: (getattr(r, sort_field, None), seq[r.entity_id])
+        return sorted(rows, key=key) if limit is None else heapq.nsmallest(limit, rows, key=key)
+
+# Snapshot: a compact binary file the index can be restored from without
+# re-reading its sources.
+#   header   magic, format, record count, stamp (microseconds since the
+#            epoch, -1 = none), offset of the string table
+#   rows     count x len(SNAPSHOT_FIELDS) u32 string ids, 0 = None
+#   strings  the distinct values, UTF-8 and NUL separated. A leading kind
+#            byte marks datetimes (ISO) and lists (items joined by US)
+# Repeated values (types, statuses, people, timestamps) are stored once.
+# Rows are read straight out of the mmap. The stamp is the entity table's
+# latest updated_at that the index was known to reflect.
+SNAPSHOT_MAGIC = b"IPEEIX01"
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIqQ")
+SNAPSHOT_FIELDS = (
+    "id", "entity_id", "entity_type", "canonical_id", "title", "summary", "tags",
+    "status", "priority", "assignee", "owner", "due_date", "updated_at",
+)
+# the entity columns a record is built from (see build_index_record)
+ENTITY_FIELDS = SNAPSHOT_FIELDS[2:]
+DATETIME_MARK, LIST_MARK, LIST_SEP = "\x01", "\x02", "\x1f"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _stamp_to_int(stamp) -> int:
+    if stamp is None:
+        return -1
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return (stamp - EPOCH) // timedelta(microseconds=1)
+
+def _int_to_stamp(value: int):
+    return None if value < 0 else EPOCH + timedelta(microseconds=value)
+
+def _encode_value(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return LIST_MARK + LIST_SEP.join(map(str, value))
+    if isinstance(value, datetime):
+        return DATETIME_MARK + value.isoformat()
+    return str(value)
+
+def _decode_value(text: str):
+    if text.startswith(LIST_MARK):
+        return text[1:].split(LIST_SEP) if len(text) > 1 else []
+    if text.startswith(DATETIME_MARK):
+        return datetime.fromisoformat(text[1:])
+    return text
+
+class EntityIndexSnapshot:
+    """
+    Read side of a snapshot file. Rows are mmapped; the string table is
+    decoded once, on first access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.count, stamp, self._strings_at = SNAPSHOT_HEADER.unpack_from(self._map, 0)
+        if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+            self.close()
+            raise ValueError(f"{path}: not an entity index snapshot (format {SNAPSHOT_FORMAT})")
+        self.stamp = _int_to_stamp(stamp)
+        self._rows = memoryview(self._map)[SNAPSHOT_HEADER.size:self._strings_at].cast("I")
+        self._values = None
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, ids) -> EntityIndex:
+        values = dict(zip(SNAPSHOT_FIELDS, map(self._values.__getitem__, ids)))
+        if values["tags"] is not None:
+            values["tags"] = list(values["tags"])  # shared by every record with these tags
+        values["search_vector"] = search_text_for(**values)
+        # restored as saved, id included, without EntityIndex.__init__
+        record = EntityIndex.__new__(EntityIndex)
+        record.__dict__.update(values)
+        return record
+
+    def __getitem__(self, i: int) -> EntityIndex:
+        if self._values is None:
+            self._load_strings()
+        width = len(SNAPSHOT_FIELDS)
+        return self._record(self._rows[i * width:(i + 1) * width])
+
+    def __iter__(self):
+        if self._values is None:
+            self._load_strings()
+        width = len(SNAPSHOT_FIELDS)
+        rows = self._rows.tolist()
+        return (self._record(rows[i:i + width]) for i in range(0, len(rows), width))
+
+    def _load_strings(self):
+        strings = self._map[self._strings_at:].decode().split("\0")
+        self._values = [None] + [_decode_value(s) for s in strings[1:]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map.closed:
+            return
+        self._rows.release()
+        self._map.close()
+
+    @staticmethod
+    def write(path: str, records, stamp=None):
+        """
+        Write `records` atomically: a reader sees the old file or the new
+        one, never a partial write.
+        """
+        ids = {None: 0}
+        rows = array("I")
+        for record in records:
+            for field in SNAPSHOT_FIELDS:
+                value = getattr(record, field)
+                key = None if value is None else _encode_value(value)
+                rows.append(ids.setdefault(key, len(ids)))
+        strings = "\0".join([""] + list(itertools.islice(ids, 1, None))).encode()
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, len(rows) // len(SNAPSHOT_FIELDS),
+            _stamp_to_int(stamp), SNAPSHOT_HEADER.size + len(rows) * rows.itemsize,
+        )
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = f"{path}.tmp-{os.getpid()}"
+        with open(partial, "wb") as f:
+            f.write(header)
+            rows.tofile(f)
+            f.write(strings)
+        os.replace(partial, path)
+
+def snapshot_path():
+    """
+    IPE_ENTITY_INDEX_SNAPSHOT, default ~/.ipe/entity_index.snapshot; "off"
+    disables snapshots.
+    """
+    path = os.getenv("IPE_ENTITY_INDEX_SNAPSHOT", os.path.expanduser("~/.ipe/entity_index.snapshot"))
+    return None if path == "off" else path
+
 # In-memory index for demo purposes
-entity_index_db: List[EntityIndex] = []
-
-# Build index record from canonical entity
-
-def build_index_record(entity):
-    data = entity.data
-    etype = getattr(entity, 'entity_type', None) or data.get('entity_type')
-    if etype == "task":
-        title = data.get("title")
-        summary = data.get("description")
-        tags = data.get("tags", [])
-        status = data.get("status")
-        priority = data.get("priority")
-        assignee = data.get("assignee")
-        owner = None
-        due_date = data.get("due_date")
-    elif etype == "pipeline":
-        title = data.get("name")
-        summary = data.get("description")
-        tags = data.get("tags", [])
-        status = data.get("status")
-        priority = None
-        assignee = None
-        owner = data.get("owner")
-        due_date = None
-    else:
-        title = data.get("title") or data.get("name") or getattr(entity, 'canonical_id', None)
-        summary = data.get("description") or ""
-        tags = data.get("tags", [])
-        status = data.get("status")
-        priority = data.get("priority")
-        assignee = data.get("assignee")
-        owner = data.get("owner")
-        due_date = data.get("due_date")
+entity_index = InMemoryEntityIndex()
+entity_index_db = entity_index.records
+
+# Build index records from `entity` rows
+
+def search_text_for(title=None, summary=None, tags=None, status=None, priority=None, **_):
     full_text = " ".join([
         str(title or ""),
         str(summary or ""),
@@ -64,33 +379,127 @@ def build_index_record(entity):
         str(status or ""),
         str(priority or ""),
     ])
-    search_vector = full_text.lower()  # Simple for demo; replace with tsvector in production
-    return EntityIndex(
-        entity_id=getattr(entity, 'id', None),
-        entity_type=etype,
-        canonical_id=getattr(entity, 'canonical_id', None),
-        title=title,
-        summary=summary,
-        tags=tags,
-        status=status,
-        priority=priority,
-        assignee=assignee,
-        owner=owner,
-        due_date=due_date,
-        updated_at=getattr(entity, 'last_modified', datetime.utcnow().isoformat()),
-        search_vector=search_vector
-    )
-
-def update_index_for_entity(entity):
+    return full_text.lower()  # Simple for demo; replace with tsvector in production
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def build_index_record(entity) -> EntityIndex:
+    """
+    Index record for an `entity` row (models.entity.Entity, or a row with
+    its columns), the index's only source: keyed by str(entity.id), with
+    updated_at as an aware datetime, so records, the database and the
+    snapshot stamp (the table's max(updated_at)) all agree.
+    """
+    values = {f: getattr(entity, f) for f in ENTITY_FIELDS}
+    if not isinstance(values["updated_at"], datetime):
+        raise TypeError(f"entity {entity.id}: updated_at must be a datetime, not {values['updated_at']!r}")
+    values["entity_id"] = str(entity.id)
+    values["updated_at"] = _utc(values["updated_at"])
+    return EntityIndex(search_vector=search_text_for(**values), **values)
+
+# Warm start: restore from the snapshot, checked against the database
+
+_state = {"loaded": False, "dirty": False, "stamp": None}
+
+def _latest_updated_at(db):
+    from sqlalchemy import text
+    latest = db.execute(text("SELECT max(updated_at) FROM entity")).scalar()
+    # as aware UTC at microsecond precision, comparable with a snapshot stamp
+    return _int_to_stamp(_stamp_to_int(latest))
+
+def _entity_count(db) -> int:
+    from sqlalchemy import text
+    return db.execute(text("SELECT count(*) FROM entity")).scalar()
+
+def _entity_rows(db, since=None):
+    from sqlalchemy import select
+    from models.entity import Entity
+    statement = select(Entity.id, *(getattr(Entity, f) for f in ENTITY_FIELDS))
+    if since is not None:
+        statement = statement.where(Entity.updated_at > since)
+    return db.execute(statement.execution_options(stream_results=True, yield_per=5000))
+
+def load_index(db=None, path=None) -> str:
+    """
+    Fill the index for this process and say how:
+      "loaded"     the snapshot is current (or there is no db to check)
+      "refreshed"  snapshot plus entities updated after its stamp
+      "rebuilt"    no usable snapshot, or rows were deleted since it was
+                   written; read every entity from the db
+      "empty"      no snapshot and no db
+    """
+    path = path or snapshot_path()
+    snapshot = None
+    if path and os.path.exists(path):
+        try:
+            snapshot = EntityIndexSnapshot(path)
+        except (ValueError, struct.error):
+            snapshot = None
+    latest = _latest_updated_at(db) if db is not None else None
+    entity_index.clear()
+    _state.update(loaded=True, dirty=False)
+    try:
+        if snapshot and (db is None or snapshot.stamp == latest):
+            entity_index.load(snapshot)
+            _state["stamp"] = snapshot.stamp
+            return "loaded"
+        if snapshot and snapshot.stamp and latest and snapshot.stamp < latest:
+            entity_index.load(snapshot)
+            for row in _entity_rows(db, since=snapshot.stamp):
+                entity_index.put(build_index_record(row))
+            # updated_at cannot reveal deletions; a count mismatch can
+            if len(entity_index) == _entity_count(db):
+                _state.update(stamp=latest, dirty=True)
+                return "refreshed"
+            entity_index.clear()
+    finally:
+        if snapshot:
+            snapshot.close()
+    if db is None:
+        return "empty"
+    entity_index.load(build_index_record(row) for row in _entity_rows(db))
+    _state.update(stamp=latest, dirty=True)
+    return "rebuilt"
+
+def save_snapshot(path=None, stamp=None):
+    path = path or snapshot_path()
+    if path:
+        EntityIndexSnapshot.write(path, entity_index.records.values(), stamp or _state["stamp"])
+        _state["dirty"] = False
+
+def _ensure_loaded():
+    # lazily, on first use: validate against the db when one is configured
+    if _state["loaded"]:
+        return
+    if os.getenv("DATABASE_URL"):
+        from db.session import get_session
+        with get_session() as db:
+            load_index(db)
+    else:
+        load_index()
+
+@atexit.register
+def _save_if_dirty():
+    if _state["dirty"]:
+        try:
+            save_snapshot()
+        except OSError:
+            pass
+
+def update_index_for_entity(entity, db=None, identity=None):
+    _ensure_loaded()
     index_record = build_index_record(entity)
-    # Remove old index for this entity_id
-    global entity_index_db
-        entity_index_db = [r for r in entity_index_db if r.entity_id != index_record.entity_id]
+    # Replaces any previous record for this entity_id. The stamp stays put:
+    # rows updated before this one may still be missing, and the next load
+    # re-reads everything after the stamp anyway.
+    entity_index.put(index_record)
+    _state["dirty"] = True
+    if db is not None:
         from services.audit.service import AuditService
-        # You may need to pass db/session/identity if available
         AuditService.log(
-            None,
-            identity=None,
+            db,
+            identity=identity,
             action="entity.index.update",
             target_type="entity",
             target_id=str(entity.id),
@@ -98,21 +507,9 @@ def update_index_for_entity(entity):
             metadata={},
             status="success",
         )
-    entity_index_db.append(index_record)
 
 # Query engine
 
 def query_entities(entity_type=None, filters=None, tags=None, search_text=None, limit=50, sort_field=None, sort_dir="desc"):
-    results = entity_index_db
-    if entity_type:
-        results = [r for r in results if r.entity_type == entity_type]
-    if filters:
-        for k, v in filters.items():
-            results = [r for r in results if getattr(r, k, None) == v]
-    if tags:
-        results = [r for r in results if set(tags).issubset(set(r.tags))]
-    if search_text:
-        results = [r for r in results if search_text.lower() in r.search_vector]
-    if sort_field:
-        results = sorted(results, key=lambda r: getattr(r, sort_field, None), reverse=(sort_dir=="desc"))
-    return results[:limit]
+    _ensure_loaded()
+    return entity_index.query(entity_type, filters, tags, search_text, limit, sort_field, sort_dir)
@@ -9,10 +9,10 @@ class SyncManager:
         self.log = []
         self.db_session = db_session
         if db_session:
-            from services.indexing import EntityIndexBuilder
-            self.index_builder = EntityIndexBuilder(db_session)
+            from services.indexing import IncrementalIndexer
+            self.indexer = IncrementalIndexer(db_session)
         else:
-            self.index_builder = None
+            self.indexer = None
 
     def sync(self, mode="full", table=None, identity=None):
         """Run a sync cycle. mode: 'full' or 'fast'. table: restrict to one table."""
@@ -49,13 +49,10 @@ class SyncManager:
             self.notion.push(records, table=t)
             if hasattr(self.t7, 'push'):
                 self.t7.push(records, table=t)
-        # Update entity index if available
-        if self.index_builder:
-            from models.entity import Entity
-            for t, records in resolved.items():
-                for record in records:
-                    if isinstance(record, Entity):
-                        self.index_builder.build_index_for_entity(record)
+        # Entity writes are logged to entity_change by trigger; apply them
+        if self.indexer:
+            self.db_session.commit()
+            self.indexer.drain()
         self.log.append(f"Sync completed: mode={mode}, table={table}")
         # Telemetry hook
         if self.db_session:
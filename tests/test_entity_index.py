@@ -0,0 +1,142 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from src.core import entity_index as core
+from src.core.entity_index import InMemoryEntityIndex, build_index_record
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def entity(i, **columns):
+    # an `entity` table row
+    return SimpleNamespace(**{
+        "id": uuid.UUID(int=i + 1),
+        "entity_type": ("task", "client")[i % 2],
+        "canonical_id": f"E-{i}",
+        "title": f"Sync webhook {i}",
+        "summary": f"retry billing invoice ref{i}",
+        "tags": [f"phase{i % 3}"],
+        "status": ("open", "blocked")[i % 2],
+        "priority": ("low", "high")[i % 2],
+        "assignee": f"user{i % 4}",
+        "owner": None,
+        "due_date": None,
+        "updated_at": BASE + timedelta(hours=i),
+        **columns,
+    })
+
+def linear(rows, entity_type=None, filters=None, tags=None, search_text=None, limit=50):
+    # the list scan the index replaced
+    results = [r for r in rows if not entity_type or r.entity_type == entity_type]
+    for k, v in (filters or {}).items():
+        results = [r for r in results if getattr(r, k, None) == v]
+    if tags:
+        results = [r for r in results if set(tags).issubset(set(r.tags))]
+    if search_text:
+        results = [r for r in results if search_text.lower() in r.search_vector]
+    return results[:limit]
+
+@pytest.fixture
+def indexed():
+    index, rows = InMemoryEntityIndex(), []
+    def put(e):
+        record = build_index_record(e)
+        rows[:] = [r for r in rows if r.entity_id != record.entity_id] + [record]
+        index.put(record)
+    for i in range(12):
+        put(entity(i))
+    return index, rows, put
+
+def ids(rows):
+    return [r.entity_id for r in rows]
+
+@pytest.mark.parametrize("query", [
+    dict(entity_type="task"),
+    dict(filters={"status": "blocked", "assignee": "user1"}),
+    dict(filters={"owner": None}),
+    dict(tags=["phase1"]),
+    dict(entity_type="client", tags=["phase2"]),
+    dict(search_text="invoice"),
+    dict(search_text="voic"),
+    dict(search_text="webhook 1"),
+    dict(search_text="ref1", tags=["phase1"]),
+])
+def test_queries_match_linear_scan(indexed, query):
+    index, rows, _ = indexed
+    assert ids(index.query(**query)) == ids(linear(rows, **query))
+
+def test_remove_drops_record_and_postings(indexed):
+    index, rows, _ = indexed
+    removed = str(uuid.UUID(int=5))
+    index.remove(removed)
+    rows[:] = [r for r in rows if r.entity_id != removed]
+    assert removed not in index.records
+    assert all(removed not in posting for posting in (*index.tags.values(), *index.tokens.values()))
+    assert "ref4" not in index.tokens
+    for query in (dict(tags=["phase1"]), dict(search_text="ref4"), dict(entity_type="task")):
+        assert ids(index.query(**query)) == ids(linear(rows, **query))
+
+def test_update_moves_tag_posting(indexed):
+    index, rows, put = indexed
+    updated = str(uuid.UUID(int=6))
+    put(entity(5, tags=["launch"]))
+    assert updated not in index.tags["phase2"]
+    assert index.tags["launch"] == {updated}
+    for query in (dict(tags=["phase2"]), dict(tags=["launch"]), dict(search_text="launch"), dict()):
+        assert ids(index.query(**query)) == ids(linear(rows, **query))
+
+class FakeEntityTable:
+    """
+    The three reads load_index makes of the `entity` table.
+    """
+
+    def __init__(self, monkeypatch, rows):
+        self.rows = rows
+        monkeypatch.setattr(core, "_latest_updated_at", lambda db: max(r.updated_at for r in self.rows))
+        monkeypatch.setattr(core, "_entity_count", lambda db: len(self.rows))
+        monkeypatch.setattr(core, "_entity_rows", lambda db, since=None: [
+            r for r in self.rows if since is None or r.updated_at > since
+        ])
+
+@pytest.fixture
+def module_index(monkeypatch):
+    # a private module-level index, restored afterwards
+    index = InMemoryEntityIndex()
+    monkeypatch.setattr(core, "entity_index", index)
+    monkeypatch.setattr(core, "entity_index_db", index.records)
+    monkeypatch.setattr(core, "_state", {"loaded": False, "dirty": False, "stamp": None})
+    return index
+
+def test_snapshot_round_trip(tmp_path, module_index, monkeypatch):
+    path = str(tmp_path / "entity_index.snapshot")
+    db = FakeEntityTable(monkeypatch, [entity(i) for i in range(3)])
+    assert core.load_index(db, path) == "rebuilt"
+    core.save_snapshot(path)
+    before = [r.to_dict().copy() for r in core.entity_index.records.values()]
+    assert core.load_index(db, path) == "loaded"
+    assert [r.to_dict() for r in core.entity_index.records.values()] == before
+    assert ids(core.query_entities(search_text="webhook 2", tags=["phase2"])) == [str(uuid.UUID(int=3))]
+    with core.EntityIndexSnapshot(path) as snapshot:
+        assert (len(snapshot), snapshot.stamp) == (3, BASE + timedelta(hours=2))
+
+def test_load_refreshes_or_rebuilds_from_the_entity_table(tmp_path, module_index, monkeypatch):
+    path = str(tmp_path / "entity_index.snapshot")
+    db = FakeEntityTable(monkeypatch, [entity(i) for i in range(3)])
+    core.load_index(db, path)
+    core.save_snapshot(path)
+    db.rows.append(entity(3))
+    assert core.load_index(db, path) == "refreshed"
+    assert len(core.entity_index) == 4
+    del db.rows[0]
+    assert core.load_index(db, path) == "rebuilt"
+    assert str(uuid.UUID(int=1)) not in core.entity_index.records
+
+def test_updates_after_a_load_replace_the_loaded_record(tmp_path, module_index, monkeypatch):
+    db = FakeEntityTable(monkeypatch, [entity(i) for i in range(3)])
+    core.load_index(db, str(tmp_path / "entity_index.snapshot"))
+    core.update_index_for_entity(entity(1, title="Renamed", updated_at=BASE + timedelta(days=1)))
+    assert len(core.entity_index) == 3
+    newest = core.query_entities(sort_field="updated_at")
+    assert [r.title for r in newest][:1] == ["Renamed"]
+    with pytest.raises(TypeError):
+        build_index_record(entity(4, updated_at="2025-01-05"))
@@ -9,7 +9,87 @@ from cli.commands.query import query_command
     (["any", "--search", "canonical sync engine"], "canonical sync engine"),
     (["pipelines", "--sort updated_at:asc", "--limit", "5"], "updated:"),
     (["clients", "status:nonexistent"], "No results."),
+    (["tasks", "--facets", "status,priority,tags"], "=== Facets"),
+    (["tasks", "status:open", "--facets", "priority"], "priority:"),
+    (["tasks", "status:open", "--fields", "canonical_id,status"], "status: open"),
+    (["tasks", "status:open", "--count"], "matching"),
+    (["clients", "status:nonexistent", "--count"], "0 matching"),
+    (["tasks", "status:open", "--explain"], "EXPLAIN (ANALYZE, BUFFERS): search"),
 ])
 def test_query_smoke(args, expect_in):
     result = query_command(args)
     assert expect_in in result
+
+def test_query_cursor_pages_do_not_overlap():
+    first = query_command(["tasks", "--limit", "2"])
+    if "next: --cursor" not in first:
+        pytest.skip("fewer than two pages of tasks")
+    cursor = first.rsplit("--cursor ", 1)[1].strip()
+    second = query_command(["tasks", "--limit", "2", "--cursor", cursor])
+    first_ids = {line.split()[1] for line in first.splitlines() if line.startswith("[")}
+    second_ids = {line.split()[1] for line in second.splitlines() if line.startswith("[")}
+    assert not first_ids & second_ids
+
+def test_query_stream(capsys):
+    footer = query_command(["tasks", "--stream", "--limit", "3"])
+    assert "rows streamed" in footer or footer == "No results."
+
+def test_query_repeat_hits_result_cache():
+    from services.query_engine.result_cache import result_cache
+    first = query_command(["tasks", "status:open"])
+    hits = result_cache.hits
+    assert query_command(["tasks", "status:open"]) == first
+    assert result_cache.hits == hits + 1
+
+def test_search_many_matches_serial_search():
+    from db.session import get_session
+    from services.query_engine.parser import parse_query_args
+    from services.query_engine.service import QueryService
+    queries = [
+        ["tasks", "status:open"], ["tasks", "tag:phase14"], ["any", "--search", "canonical sync engine"],
+        ["tasks", "status:open", "--fields", "canonical_id,status"],
+    ]
+    with get_session() as db:
+        batched = QueryService.search_many(db, [parse_query_args(list(q)) for q in queries])
+        serial = [QueryService.search(db, parse_query_args(list(q)), use_cache=False) for q in queries]
+    assert [[r.id for r in rows] for rows in batched] == [[r.id for r in rows] for rows in serial]
+    assert batched[-1] == serial[-1]
+
+def test_bulk_rebuild_indexes_every_entity():
+    from sqlalchemy import text
+    from db.session import get_session
+    from services.indexing import EntityIndexBuilder
+    with get_session() as db:
+        stats = EntityIndexBuilder(db).rebuild_all_indexes(chunk_size=50, resume=False)
+        entities = db.execute(text("SELECT count(*) FROM entity")).scalar()
+        missing = db.execute(text(
+            "SELECT count(*) FROM entity e LEFT JOIN entity_index ei ON ei.entity_id = e.id WHERE ei.id IS NULL"
+        )).scalar()
+    assert stats.entities == entities
+    assert missing == 0
+
+def test_change_log_reindexes_updated_entity():
+    from sqlalchemy import text
+    from db.session import get_session
+    from services.indexing import IncrementalIndexer
+    with get_session() as db:
+        entity_id, title = db.execute(text("SELECT id, title FROM entity LIMIT 1")).one()
+        changed = f"{title or ''} (changed)"
+        db.execute(text("UPDATE entity SET title = :t WHERE id = :id"), {"t": changed, "id": entity_id})
+        db.commit()
+        try:
+            IncrementalIndexer(db).drain()
+            indexed = db.execute(text("SELECT title FROM entity_index WHERE entity_id = :id"), {"id": entity_id}).scalar()
+            assert indexed == changed
+        finally:
+            db.execute(text("UPDATE entity SET title = :t WHERE id = :id"), {"t": title, "id": entity_id})
+            db.commit()
+            IncrementalIndexer(db).drain()
+
+def test_parallel_rebuild_covers_every_entity():
+    from sqlalchemy import text
+    from db.session import get_session
+    from services.indexing import parallel_rebuild
+    stats = parallel_rebuild(2, chunk_size=50, resume=False)
+    with get_session() as db:
+        assert stats.entities == db.execute(text("SELECT count(*) FROM entity")).scalar()
@@ -1,5 +1,18 @@
+import os
+os.environ.setdefault("IPE_EMBEDDING_PROVIDER", "local")
+
+import numpy as np
+from types import SimpleNamespace
 import pytest
 from cli.commands.query import query_command
+from services.query_engine.embedding_providers import HashingProvider
+from services.query_engine.embedding_models import resolve_dimensions, require_same_space
+from services.query_engine.semantic_service import quantization_settings
+from services.query_engine.ann_index import parse_indexdef, recommended_lists
+from services.query_engine.projection import detached
+from services.query_engine.bulk_embedder import retry_delay
+from models.entity import Entity  # noqa: F401  (resolves the EntityIndex relationship)
+from models.entity_index import EntityIndex
 
 @pytest.mark.parametrize("args, expect_in", [
     (["tasks", "status:open"], "status: open"),
@@ -10,7 +23,108 @@ from cli.commands.query import query_command
     (["clients", "status:nonexistent"], "No results."),
     (["any", "--semantic", "sync conflicts"], "No results."),
     (["tasks", "--semantic", "high priority sync errors"], "priority:"),
+    (["tasks", "tag:engine", "--semantic", "sync conflicts", "--limit", "5"], "'engine'"),
+    (["any", "--search", "sync", "--semantic", "sync conflicts", "--weights", "0.7,0.3"], "match:"),
+    (["task", "--semantic", "sync conflicts", "--ann-profile", "accurate"], "TASK-"),
+    (["tasks", "--semantic", "sync conflicts", "--explain"], "EXPLAIN (ANALYZE, BUFFERS): semantic"),
 ])
 def test_query_semantic_smoke(args, expect_in):
     result = query_command(args)
     assert expect_in in result
+
+def test_local_provider_is_offline_and_normalised():
+    provider = HashingProvider()
+    a, b, c = provider.embed(["canonical sync engine", "sync engine", "client invoice"])
+    assert provider.embed_one("canonical sync engine") == a
+    assert np.isclose(np.linalg.norm(a), 1.0, atol=1e-6)
+    assert np.dot(a, b) > np.dot(a, c)
+
+def test_registry_reduces_dimensions_and_refuses_cross_model():
+    assert resolve_dimensions("text-embedding-3-large") == 3072
+    assert resolve_dimensions("text-embedding-3-large", 256) == 256
+    with pytest.raises(ValueError):
+        resolve_dimensions("text-embedding-ada-002", 256)
+    with pytest.raises(ValueError):
+        require_same_space(("text-embedding-3-small", 1536), ("text-embedding-3-large", 1536))
+
+def test_quantization_defaults_and_override(monkeypatch):
+    monkeypatch.delenv("IPE_RERANK_FACTOR", raising=False)
+    monkeypatch.setenv("IPE_VECTOR_QUANTIZATION", "binary")
+    assert quantization_settings() == ("binary", 10)
+    monkeypatch.setenv("IPE_RERANK_FACTOR", "3")
+    assert quantization_settings() == ("binary", 3)
+    monkeypatch.setenv("IPE_VECTOR_QUANTIZATION", "pq")
+    with pytest.raises(ValueError):
+        quantization_settings()
+
+def test_ann_index_introspection_and_sizing():
+    index = parse_indexdef("idx", (
+        "CREATE INDEX idx ON public.entity_embedding USING ivfflat (((embedding)::vector(1536)) vector_cosine_ops) "
+        "WITH (lists='100') WHERE ((model = 'text-embedding-3-small'::text) AND (dimensions = 1536))"
+    ))
+    assert (index.method, index.model, index.dimensions, index.options) == (
+        "ivfflat", "text-embedding-3-small", 1536, {"lists": 100})
+    assert parse_indexdef("pk", "CREATE UNIQUE INDEX pk ON public.entity_embedding USING btree (id)") is None
+    assert recommended_lists(50_000) == 50
+    assert recommended_lists(4_000_000) == 2000
+
+def test_openai_timeouts_and_dropped_connections_are_retried():
+    openai = pytest.importorskip("openai")
+    httpx = pytest.importorskip("httpx")
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    assert retry_delay(openai.APITimeoutError(request=request), 0, 1.0, 30.0) is not None
+    assert retry_delay(openai.APIConnectionError(request=request), 1, 1.0, 30.0) is not None
+    assert retry_delay(ValueError("bad input"), 0, 1.0, 30.0) is None
+
+def test_stream_footer_offers_a_cursor_only_for_keyset_order(monkeypatch, capsys):
+    import uuid
+    from datetime import datetime, timezone
+    from cli.commands.query import stream_results
+    from services.query_engine.parser import parse_query_args
+    from services.query_engine.service import QueryService
+    rows = [SimpleNamespace(id=uuid.uuid4(), updated_at=datetime(2025, 1, i + 1, tzinfo=timezone.utc),
+                            canonical_id=f"TASK-{i}", title="t", status=None, tags=None, summary=None)
+            for i in range(2)]
+    monkeypatch.setattr(QueryService, "stream", lambda db, criteria: iter(rows))
+    assert "next: --cursor" in stream_results(None, parse_query_args(["tasks", "--stream", "--limit", "2"]))
+    ranked = parse_query_args(["tasks", "--search", "sync", "--stream", "--limit", "2"])
+    assert "next: --cursor" not in stream_results(None, ranked)
+
+def test_cached_embedding_leaves_the_commit_to_the_caller():
+    from contextlib import nullcontext
+    from services.query_engine import embedding_providers
+    from services.query_engine.embedding import cached_embedding
+
+    class RemoteHashing(HashingProvider):
+        remote = True
+
+    class Session:
+        def __init__(self):
+            self.calls = []
+        def execute(self, statement, params=None):
+            self.calls.append(("execute", params))
+            return SimpleNamespace(fetchone=lambda: None)
+        def begin_nested(self):
+            self.calls.append(("savepoint", None))
+            return nullcontext()
+        def commit(self):
+            self.calls.append(("commit", None))
+
+    previous = embedding_providers.get_provider()
+    embedding_providers.set_provider(RemoteHashing(dimensions=64))
+    try:
+        db = Session()
+        cached_embedding(db, "an ad-hoc query nobody has asked before")
+    finally:
+        embedding_providers.set_provider(previous)
+    kinds = [kind for kind, _ in db.calls]
+    assert "commit" not in kinds and "savepoint" in kinds
+    assert db.calls[-1][1]["ttl"] > 0
+
+def test_detached_rows_outlive_the_session():
+    row = EntityIndex(canonical_id="TASK-1", title="Sync", status="open")
+    row.rank, row.snippet = 0.5, "[Sync]"
+    (plain,) = detached([row])
+    assert (plain.canonical_id, plain.status, plain.rank, plain.snippet) == ("TASK-1", "open", 0.5, "[Sync]")
+    assert not isinstance(plain, EntityIndex)
+    assert detached([plain]) == [plain]